@@ -0,0 +1,185 @@
+"""
+Microbenchmarks of gen1, gen2 and tag rendering, split by phase.
+
+Run from the `scripts` directory:
+
+    python bench.py run [-o results.json] [--filter gen2/width]
+    python bench.py compare baseline.json results.json [--threshold 0.1]
+
+Phases:
+    analysis   gen2: `FieldType.resolve_type` over every field of the model tree;
+               gen1: schema validation and ref indexing (`parse_schema` on a cold cache)
+    tree       `generate_form_inner` on warm plan / schema caches
+    serialize  `str(tag)` of the finished tree
+    compact    `tag.render(compact=True)` of the same tree, minified output
+
+Synthetic models scale in width (flat fields), depth (nested submodels), union count (fields that are unions
+of three submodels) and enum size (one enum field and one enum list field). gen1 renders `model_json_schema()`
+of the same models.
+`compare` prints the ratio of the best times and exits with 1 if any case got slower by more than the threshold.
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+import timeit
+from collections.abc import Callable, Iterator
+from enum import Enum
+from pathlib import Path
+from typing import Any
+
+from pydantic import BaseModel, create_model
+
+from formgen import gen1, gen2
+from formgen.gen2 import FieldType
+
+REPEAT = 5
+MIN_TIME = 0.05
+
+
+def width_model(width: int) -> type[BaseModel]:
+    kinds = [(str, "value"), (int, 1), (bool, True)]
+    return create_model(f"Width{width}", **{f"field_{i}": kinds[i % len(kinds)] for i in range(width)})
+
+
+def depth_model(depth: int) -> type[BaseModel]:
+    model = create_model("Depth0", text=(str, "text"), number=(int, 1))
+    for level in range(1, depth + 1):
+        model = create_model(f"Depth{level}", text=(str, "text"), number=(int, 1), child=(model, model()))
+    return model
+
+
+def union_model(unions: int) -> type[BaseModel]:
+    variants = [create_model(f"Variant{i}", **{f"field_{i}": (str, "value"), "flag": (bool, False)}) for i in range(3)]
+    union = variants[0] | variants[1] | variants[2]
+    return create_model(f"Unions{unions}", **{f"union_{i}": (union, variants[i % 3]()) for i in range(unions)})
+
+
+def enum_model(size: int) -> type[BaseModel]:
+    enum = Enum(f"Enum{size}", {f"member_{i}": f"member {i}" for i in range(size)}, type=str)
+    members = list(enum)
+    return create_model(f"Enums{size}", choice=(enum, members[-1]), choices=(list[enum], members[::2]))  # type: ignore
+
+
+SHAPES: dict[str, tuple[Callable[[int], type[BaseModel]], tuple[int, ...]]] = {
+    "width": (width_model, (10, 100, 1000)),
+    "depth": (depth_model, (1, 4, 16)),
+    "unions": (union_model, (1, 8, 32)),
+    "enum": (enum_model, (10, 100, 1000)),
+}
+
+
+def model_fields(model_type: type[BaseModel]) -> Iterator[Any]:
+    for field in model_type.model_fields.values():
+        yield field
+        for nested in (field.annotation, *getattr(field.annotation, "__args__", ())):
+            if isinstance(nested, type) and issubclass(nested, BaseModel):
+                yield from model_fields(nested)
+
+
+def measure(func: Callable[[], Any]) -> dict[str, float]:
+    timer = timeit.Timer(func)
+    number = 1
+    while timer.timeit(number) < MIN_TIME:
+        number *= 2
+    times = [t / number for t in timer.repeat(REPEAT, number)]
+    return {"best_ns": min(times) * 1e9, "median_ns": statistics.median(times) * 1e9, "number": number}
+
+
+def gen2_cases(model_type: type[BaseModel]) -> Iterator[tuple[str, Callable[[], Any], int]]:
+    model = model_type()
+    fields = list(model_fields(model_type))
+    tree = gen2.generate_form_inner(model_type, model)
+
+    yield "analysis", lambda: [FieldType.resolve_type(field) for field in fields], len(fields)
+    yield "tree", lambda: gen2.generate_form_inner(model_type, model), len(fields)
+    yield "serialize", lambda: str(tree), len(str(tree))
+    yield "compact", lambda: tree.render(compact=True), len(tree.render(compact=True))
+
+
+def gen1_cases(model_type: type[BaseModel]) -> Iterator[tuple[str, Callable[[], Any], int]]:
+    raw_schema = model_type.model_json_schema()
+    schema = gen1.parse_schema(raw_schema)
+    tree = gen1.generate_form_inner(schema=schema)
+
+    def analysis() -> None:
+        gen1.clear_schema_cache()
+        gen1.index_for(gen1.parse_schema(raw_schema))
+
+    yield "analysis", analysis, len(json.dumps(raw_schema))
+    yield "tree", lambda: gen1.generate_form_inner(schema=schema), len(schema.properties)
+    yield "serialize", lambda: str(tree), len(str(tree))
+    yield "compact", lambda: tree.render(compact=True), len(tree.render(compact=True))
+
+
+def run(args: argparse.Namespace) -> None:
+    results = []
+    for gen, cases in (("gen2", gen2_cases), ("gen1", gen1_cases)):
+        for shape, (factory, sizes) in SHAPES.items():
+            for size in sizes:
+                for phase, func, units in cases(factory(size)):
+                    name = f"{gen}/{shape}/{size}/{phase}"
+                    if args.filter and args.filter not in name:
+                        continue
+                    result = {"name": name, "units": units} | measure(func)
+                    results.append(result)
+                    print(f"{name:<28} {result['best_ns'] / 1e3:>12.1f} us {units:>10}", file=sys.stderr)
+
+    report = {
+        "python": sys.version,
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "results": results,
+    }
+    dumped = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(dumped + "\n")
+    else:
+        print(dumped)
+
+
+def compare(args: argparse.Namespace) -> None:
+    old = {r["name"]: r for r in json.loads(Path(args.baseline).read_text())["results"]}
+    new = {r["name"]: r for r in json.loads(Path(args.current).read_text())["results"]}
+
+    regressions = 0
+    print(f"{'case':<28} {'baseline, us':>13} {'current, us':>13} {'ratio':>7}")
+    for name in sorted(old.keys() & new.keys()):
+        ratio = new[name]["best_ns"] / old[name]["best_ns"]
+        mark = ""
+        if ratio > 1 + args.threshold:
+            mark = "  SLOWER"
+            regressions += 1
+        elif ratio < 1 - args.threshold:
+            mark = "  faster"
+        print(f"{name:<28} {old[name]['best_ns'] / 1e3:>13.1f} {new[name]['best_ns'] / 1e3:>13.1f} {ratio:>7.2f}{mark}")
+
+    for name in sorted(old.keys() ^ new.keys()):
+        print(f"{name:<28} only in {'baseline' if name in old else 'current'}")
+
+    sys.exit(1 if regressions else 0)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(required=True)
+
+    run_parser = commands.add_parser("run", help="run the benchmarks and write a json report")
+    run_parser.add_argument("-o", "--output", help="report file, stdout by default")
+    run_parser.add_argument("--filter", help="only run cases whose name contains this, e.g. `gen2/width`")
+    run_parser.set_defaults(command=run)
+
+    compare_parser = commands.add_parser("compare", help="compare two json reports")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.1, help="relative slowdown treated as regression")
+    compare_parser.set_defaults(command=compare)
+
+    args = parser.parse_args()
+    args.command(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Cost of html escaping in serialization.
+
+Run from the `scripts` directory: `python bench_escape.py`.
+Every width model of `bench.py` is rendered twice: once with plain values (the scan finds nothing, the usual case)
+and once with every string value full of `<>&"`. Each is serialized with escaping as shipped and with `escape`
+replaced by `str`, which is the unescaped output of earlier versions. Template rendering is measured the same way.
+"""
+import timeit
+from collections.abc import Callable
+from typing import Any
+
+from bench import width_model
+
+from formgen import tags
+from formgen.gen2 import generate_form
+from formgen.gen2 import template as template_module
+from formgen.gen2.template import render_form
+
+HOSTILE = '<script>alert("&")</script>'
+REPEAT = 7
+
+
+def no_escape(value: object, quote: bool = True) -> str:
+    return str(value)
+
+
+def measure(func: Callable[[], Any], number: int) -> tuple[float, float]:
+    # best (unescaped, escaped) times; rounds alternate, so both see the same machine noise
+    saved = tags.escape, template_module.escape
+    unescaped, escaped = [], []
+    for _ in range(REPEAT):
+        tags.escape = template_module.escape = no_escape  # type: ignore
+        try:
+            unescaped.append(timeit.timeit(func, number=number) / number)
+        finally:
+            tags.escape, template_module.escape = saved
+        escaped.append(timeit.timeit(func, number=number) / number)
+    return min(unescaped), min(escaped)
+
+
+def main() -> None:
+    print(f"{'case':<22} {'unescaped, us':>14} {'escaped, us':>12} {'overhead':>9}")
+    for width in (10, 100, 1000):
+        model_type = width_model(width)
+        plain = model_type()
+        hostile = model_type(**{name: HOSTILE for name, value in plain if isinstance(value, str)})
+        number = max(1, 20_000 // width)
+
+        for values, model in (("plain", plain), ("hostile", hostile)):
+            form = generate_form(model_type, model)
+            cases: list[tuple[str, Callable[[], Any]]] = [
+                ("tree", lambda: str(form)),  # noqa: B023
+                ("template", lambda: render_form(model_type, model)),  # noqa: B023
+            ]
+            for name, func in cases:
+                before, after = measure(func, number)
+                print(
+                    f"{f'{name}/{values}/{width}':<22} {before * 1e6:>14.1f} {after * 1e6:>12.1f}"
+                    f" {after / before - 1:>+9.1%}",
+                )
+
+
+if __name__ == "__main__":
+    main()
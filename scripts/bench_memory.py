@@ -0,0 +1,70 @@
+"""
+Memory per Tag node of a large `gen2.generate_form` tree.
+
+Run from the `scripts` directory: `python bench_memory.py`.
+"""
+import sys
+import tracemalloc
+from collections.abc import Iterator
+from enum import Enum
+
+from pydantic import BaseModel, create_model
+
+from formgen.gen2 import generate_form
+from formgen.tags import OptionList, SelectedOptions, SelectTag, Tag, Tags
+
+
+def walk(tag: Tag) -> Iterator[Tag]:
+    yield tag
+    if isinstance(tag, Tags):
+        for inner in tag.tags:
+            yield from walk(inner)
+    if isinstance(tag, SelectTag):
+        if isinstance(tag.options, Tag):
+            # `SelectedOptions` is one node, iterating it would build an `OptionTag` per option
+            yield tag.options
+        else:
+            yield from tag.options
+
+
+def option_list_size(options: OptionList) -> int:
+    markup = [part for rendered in options._markup.values() for part in rendered]  # noqa: SLF001
+    parts = [options.values, options.labels, *options.labels, options.positions, *options.positions.values(), *markup]
+    return sum(map(sys.getsizeof, parts))
+
+
+def shared_size(form: Tag) -> int:
+    # option lists are built once per enum and shared by every form, so the traced size of a form leaves them out
+    lists = {id(tag.options): tag.options for tag in walk(form) if isinstance(tag, SelectedOptions)}
+    return sum(map(option_list_size, lists.values()))
+
+
+def wide_model(width: int) -> type[BaseModel]:
+    enum = Enum("Big", {f"member_{i}": f"member {i}" for i in range(20)}, type=str)
+    sub = create_model("Sub", integer=(int, 1), flag=(bool, True), text=(str, "text"))
+    fields = {}
+    for i in range(width):
+        fields[f"str_{i}"] = (str, f"value {i}")
+        fields[f"enum_{i}"] = (enum, enum.member_1)
+        fields[f"sub_{i}"] = (sub, sub())
+    return create_model("Wide", **fields)
+
+
+def main() -> None:
+    print(f"{'fields':>8} {'nodes':>8} {'bytes':>12} {'bytes/node':>11} {'shared':>9}")
+    for width in (10, 100, 1000):
+        model_type = wide_model(width)
+        model = model_type()
+        generate_form(model_type, model)  # warm up plan caches
+
+        tracemalloc.start()
+        form = generate_form(model_type, model)
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        nodes = sum(1 for _ in walk(form))
+        print(f"{width * 3:>8} {nodes:>8} {size:>12} {size / nodes:>11.1f} {shared_size(form):>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""
+Rendering time vs. tree size for nested `gen2.generate_form` output.
+
+Run from the `scripts` directory: `python bench_render.py`.
+Time per output byte should stay flat as nesting depth grows.
+"""
+import timeit
+
+from pydantic import BaseModel, create_model
+
+from formgen.gen2 import generate_form
+
+
+def nested_model(depth: int, width: int = 4) -> type[BaseModel]:
+    model: type[BaseModel] = create_model("Leaf", **{f"str_{i}": (str, f"value {i}") for i in range(width)})
+    for level in range(depth):
+        fields = {f"str_{i}": (str, f"value {i}") for i in range(width)}
+        model = create_model(f"Level{level}", child=(model, model()), **fields)
+    return model
+
+
+def main() -> None:
+    print(f"{'depth':>6} {'bytes':>10} {'render, ms':>12} {'ns/byte':>10}")
+    for depth in (1, 2, 4, 8, 16, 32):
+        model_type = nested_model(depth)
+        model = model_type()
+        form = generate_form(model_type, model)
+
+        size = len(str(form))
+        number = max(1, 2000 // (depth + 1))
+        spent = min(timeit.repeat(lambda: str(form), number=number, repeat=5)) / number  # noqa: B023
+
+        print(f"{depth:>6} {size:>10} {spent * 1e3:>12.3f} {spent * 1e9 / size:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
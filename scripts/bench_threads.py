@@ -0,0 +1,80 @@
+"""
+Throughput of form generation from 1 to N threads, and a reentrancy check.
+
+Run from the `scripts` directory: `python bench_threads.py [max threads]`.
+Every thread starts on cold caches and every rendered form is compared with a single-threaded reference,
+so races in plan / template / schema caching show up as a mismatch.
+On a GIL build throughput stays flat; on free-threaded CPython (3.13t) it should scale with the core count.
+"""
+import json
+import sys
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from test import BaseSubModelN1, BaseSubModelN2, Enumed, TestModel
+
+from formgen import gen1, gen2
+from formgen.gen2.template import render_form
+
+ROUNDS = 200
+
+CONFIG_SCHEMA = json.loads((Path(__file__).parent / "config_schema.json").read_text())
+
+MODEL = TestModel(
+    some_str="some_str...",
+    sub=BaseSubModelN2(integer=-1),
+    description="test",
+    description_html="<h1> test </h1>",
+    some_bool=False,
+    sub_1=BaseSubModelN1(integer=-2),
+    some_unitialized_list=["1", "2"],
+    some_enum=Enumed.val3,
+)
+
+WORKLOADS: dict[str, tuple[Callable[[], str], Callable[[], None]]] = {
+    "gen2 tree": (lambda: str(gen2.generate_form(TestModel, MODEL)), gen2.clear_plan_cache),
+    "gen2 template": (lambda: render_form(TestModel, MODEL), gen2.clear_plan_cache),
+    "gen1": (lambda: str(gen1.generate_form(CONFIG_SCHEMA)), gen1.clear_schema_cache),
+}
+
+
+def run(render: Callable[[], str], reference: str, threads: int) -> float:
+    barrier = threading.Barrier(threads)
+
+    def worker() -> None:
+        barrier.wait()
+        for _ in range(ROUNDS):
+            if render() != reference:
+                raise AssertionError("output differs from the single-threaded reference")
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        started = time.perf_counter()
+        for future in [executor.submit(worker) for _ in range(threads)]:
+            future.result()
+        return time.perf_counter() - started
+
+
+def main() -> None:
+    max_threads = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    counts = [n for n in (1, 2, 4, 8, 16, 32, 64) if n <= max_threads]
+
+    gil = sys._is_gil_enabled() if hasattr(sys, "_is_gil_enabled") else True  # noqa: SLF001
+    print(f"python {sys.version.split()[0]}, GIL {'enabled' if gil else 'disabled'}")
+    print(f"{'workload':>14} {'threads':>8} {'forms/s':>10} {'speedup':>8}")
+
+    for name, (render, clear) in WORKLOADS.items():
+        reference = render()
+        base = 0.0
+        for threads in counts:
+            clear()
+            spent = run(render, reference, threads)
+            rate = threads * ROUNDS / spent
+            base = base or rate
+            print(f"{name:>14} {threads:>8} {rate:>10.0f} {rate / base:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,21 @@
 import json
-from fastapi import FastAPI
-from fastapi.responses import HTMLResponse
+import uuid
+from collections.abc import AsyncIterator, Iterator
+from functools import cache
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
+from pydantic import BaseModel
 
 from formgen import generate_form
-from formgen.gen2 import generate_form as generate_form_v2
+from formgen.gen2 import Context, Contexts, FieldType
+from formgen.gen2 import form_fingerprint as form_fingerprint_v2, generate_form as generate_form_v2
+from formgen.gen2.aio import aiter_render, generate_form_async
+from formgen.gen2.template import render_form as render_form_v2
 from formgen.gen2.script import script as generate_form_v2_script
 from formgen.gen1.schema import Types
+from formgen.fragments import ENCODINGS, FragmentCache, choose_encoding
 from test import TestModel, BaseSubModelN1, BaseSubModelN2, Enumed
+from bench import SHAPES
 
 base = """
 <!DOCTYPE html>
@@ -49,6 +58,26 @@ base = """
 </html>
 """  # noqa: E501
 
+# same page without any external assets, for load tests on a machine without network access
+bare = """
+<!DOCTYPE html>
+
+<html lang="ru">
+    <head>
+        <meta charset="utf-8">
+        <meta name="viewport" content="width=device-width, initial-scale=1">
+    </head>
+    <body>
+        <div class="container">
+            <div class="mb-3">
+                {body}
+            </div>
+        </div>
+        {scripts}
+    </body>
+</html>
+"""
+
 scripts = f"""
 <script>
 {generate_form_v2_script}
@@ -58,9 +87,13 @@ scripts = f"""
 app = FastAPI()
 
 
-@app.get("/")
-def load_test() -> HTMLResponse:
-    test_model = TestModel(
+# fixed, so the test model (and the ETag of `/`) is the same on every request
+TEST_MODEL_ID = uuid.UUID("5f0c6f3e-8a55-4c9b-9d0a-3f1b2c4d5e6f")
+
+
+def make_test_model() -> TestModel:
+    return TestModel(
+        some_id=TEST_MODEL_ID,
         some_str="some_str...",
         sub=BaseSubModelN2(integer=-1),
         description="test",
@@ -71,11 +104,31 @@ def load_test() -> HTMLResponse:
         some_enum=Enumed.val3,
     )
 
+
+# the preview of `description_html` is shown as html, the value is the constant above rather than user input
+TEST_CONTEXTS = Contexts({"description_html": Context(override=FieldType.HTML, trusted_html=True)})
+
+
+def not_modified(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match", "")
+    return any(tag.strip().removeprefix("W/") in (etag, "*") for tag in if_none_match.split(",") if tag.strip())
+
+
+@app.get("/")
+def load_test(request: Request) -> Response:
+    test_model = make_test_model()
+
+    # the page around the form never changes, so the form fingerprint is enough for an ETag
+    etag = f'"{form_fingerprint_v2(TestModel, test_model, form_id="test-form", contexts=TEST_CONTEXTS)}"'
+    if not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
     try:
         form = generate_form_v2(
             model_type=TestModel,
             model=test_model,
             form_id="test-form",
+            contexts=TEST_CONTEXTS,
             # values=test_model.dict(),
             # overrides={
             #     "description": Types.textarea,
@@ -92,7 +145,44 @@ def load_test() -> HTMLResponse:
         form = f"<pre>{ str(ex) }</pre>"
 
     body = f"{form}\n\n"
-    return HTMLResponse(base.format(body=body, scripts=scripts))
+    return HTMLResponse(base.format(body=body, scripts=scripts), headers={"ETag": etag})
+
+
+@app.get("/stream")
+def load_test_stream() -> StreamingResponse:
+    form = generate_form_v2(
+        model_type=TestModel,
+        model=make_test_model(),
+        form_id="test-form",
+    )
+
+    head, tail = base.split("{body}")
+
+    def body() -> Iterator[str]:
+        yield head.format()
+        yield from form.iter_chunks()
+        yield tail.format(scripts=scripts)
+
+    return StreamingResponse(body(), media_type="text/html")
+
+
+@app.get("/async")
+async def load_test_async() -> StreamingResponse:
+    form = await generate_form_async(
+        model_type=TestModel,
+        model=make_test_model(),
+        form_id="test-form",
+    )
+
+    head, tail = base.split("{body}")
+
+    async def body() -> AsyncIterator[str]:
+        yield head.format()
+        async for chunk in aiter_render(form):
+            yield chunk
+        yield tail.format(scripts=scripts)
+
+    return StreamingResponse(body(), media_type="text/html")
 
 
 # @app.get("/j")
@@ -120,3 +210,65 @@ def load_test() -> HTMLResponse:
 @app.post("/")
 def test(inp: TestModel) -> TestModel:
     return inp
+
+
+# load test endpoints, driven by `load.py`: one form per synthetic model shape of `bench.py`
+
+
+# whole pages with their gzip / brotli encodings, for `render=cached`
+page_cache = FragmentCache(max_bytes=256 * 1024 * 1024)
+
+
+@cache
+def load_model(shape: str, size: int) -> type[BaseModel]:
+    if shape not in SHAPES:
+        raise HTTPException(status_code=404, detail=f"unknown shape {shape!r}, one of {', '.join(SHAPES)}")
+    factory, _ = SHAPES[shape]
+    return factory(size)
+
+
+@app.get("/load/{shape}/{size}")
+def load_form(request: Request, shape: str, size: int, render: str = "tree", compact: bool = False) -> Response:
+    model_type = load_model(shape, size)
+
+    # answered before anything is rendered; every representation (render mode, encoding) gets its own tag
+    encoding = choose_encoding(request.headers.get("accept-encoding", ""), ENCODINGS) if render == "cached" else ""
+    fingerprint = form_fingerprint_v2(model_type, model_type(), form_id="load-form")
+    etag = f'"{fingerprint}-{render}{"-compact" if compact else ""}{"-" + encoding if encoding else ""}"'
+    if not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    match render:
+        case "tree":
+            form = generate_form_v2(model_type=model_type, model=model_type(), form_id="load-form").render(compact)
+        case "template":
+            form = render_form_v2(model_type=model_type, model=model_type(), form_id="load-form", compact=compact)
+        case "cached":
+            body, encoding = page_cache.render_encoded(
+                (model_type, "load-form", compact),
+                lambda: bare.format(
+                    body=render_form_v2(model_type=model_type, form_id="load-form", compact=compact),
+                    scripts=scripts,
+                ),
+                accept_encoding=request.headers.get("accept-encoding", ""),
+            )
+            headers = {"Vary": "Accept-Encoding", "ETag": etag}
+            if encoding != "identity":
+                headers["Content-Encoding"] = encoding
+            return Response(body, media_type="text/html", headers=headers)
+        case _:
+            raise HTTPException(status_code=400, detail="render is one of tree, template, cached")
+
+    return HTMLResponse(bare.format(body=form, scripts=scripts), headers={"ETag": etag})
+
+
+@app.get("/load/{shape}/{size}/data")
+def load_data(shape: str, size: int) -> dict:
+    # default values of the form, as `script.py` submits them
+    return load_model(shape, size)().model_dump(mode="json", by_alias=True)
+
+
+@app.post("/load/{shape}/{size}")
+def load_submit(shape: str, size: int, inp: dict) -> dict:
+    model_type = load_model(shape, size)
+    return model_type.model_validate(inp).model_dump(mode="json", by_alias=True)
@@ -0,0 +1,231 @@
+"""
+Local HTTP load test of the form endpoints in `debug.py`.
+
+Run from the `scripts` directory:
+
+    python load.py --spawn                                   # starts `uvicorn debug:app` on a free port
+    python load.py --url http://127.0.0.1:8000 --shapes width/100,enum/1000 --concurrency 32 --duration 10
+
+For every shape (`bench.py` synthetic models, `{shape}/{size}`) it GETs the rendered form and POSTs the default
+values back, and reports requests/sec, p50 / p99 latency and bytes per response.
+Only the standard library is used on the client side and the pages have no external assets, so it runs offline.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from urllib.parse import urlsplit
+
+DEFAULT_SHAPES = "width/10,width/100,width/1000,depth/16,unions/32,enum/1000"
+
+
+@dataclass
+class Stats:
+    latencies: list[float] = field(default_factory=list)
+    sizes: list[int] = field(default_factory=list)
+    errors: int = 0
+
+
+class Connection:
+    # keep-alive HTTP/1.1 client, just enough for the debug app: content-length and chunked bodies
+    def __init__(self, host: str, port: int) -> None:
+        self.host = host
+        self.port = port
+        self.reader: asyncio.StreamReader | None = None
+        self.writer: asyncio.StreamWriter | None = None
+        self.etag = ""
+
+    async def request(self, method: str, path: str, body: bytes = b"", extra: str = "") -> tuple[int, bytes]:
+        if self.writer is None or self.writer.is_closing():
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        assert self.reader is not None
+
+        headers = f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Length: {len(body)}\r\n{extra}"
+        if body:
+            headers += "Content-Type: application/json\r\n"
+        self.writer.write(headers.encode() + b"\r\n" + body)
+        await self.writer.drain()
+
+        head = (await self.reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+        status = int(head[0].split(" ")[1])
+        response_headers = {k.lower(): v.strip() for k, _, v in (line.partition(":") for line in head[1:] if line)}
+
+        if response_headers.get("transfer-encoding") == "chunked":
+            chunks = []
+            while size := int((await self.reader.readline()).strip(), 16):
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readexactly(2)
+            await self.reader.readexactly(2)
+            data = b"".join(chunks)
+        else:
+            data = await self.reader.readexactly(int(response_headers.get("content-length", 0)))
+
+        self.etag = response_headers.get("etag", self.etag)
+        if response_headers.get("connection") == "close":
+            self.writer.close()
+        return status, data
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+
+
+async def hammer(
+    host: str,
+    port: int,
+    method: str,
+    path: str,
+    body: bytes,
+    concurrency: int,
+    duration: float,
+    extra: str = "",
+    revalidate: bool = False,
+) -> Stats:
+    stats = Stats()
+    deadline = time.perf_counter() + duration
+
+    async def worker() -> None:
+        connection = Connection(host, port)
+        try:
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    # a browser reloading the page: the ETag of the previous response comes back as If-None-Match
+                    conditional = f"If-None-Match: {connection.etag}\r\n" if revalidate and connection.etag else ""
+                    status, data = await connection.request(method, path, body, extra + conditional)
+                except (OSError, asyncio.IncompleteReadError):
+                    stats.errors += 1
+                    connection.close()
+                    connection = Connection(host, port)
+                    continue
+                stats.latencies.append(time.perf_counter() - started)
+                stats.sizes.append(len(data))
+                if status not in (200, 304):
+                    stats.errors += 1
+        finally:
+            connection.close()
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return stats
+
+
+def summary(shape: str, method: str, stats: Stats, duration: float) -> dict:
+    latencies = sorted(stats.latencies)
+    if len(latencies) > 1:
+        quantiles = statistics.quantiles(latencies, n=100)
+    else:
+        # one request is every quantile, and there is none when every request errored
+        quantiles = (latencies or [math.nan]) * 99
+    return {
+        "shape": shape,
+        "method": method,
+        "requests": len(latencies),
+        "errors": stats.errors,
+        "rps": len(latencies) / duration,
+        "p50_ms": quantiles[49] * 1e3,
+        "p99_ms": quantiles[98] * 1e3,
+        "bytes": statistics.mean(stats.sizes) if stats.sizes else 0,
+    }
+
+
+async def run(args: argparse.Namespace, host: str, port: int) -> list[dict]:
+    results = []
+    print(f"{'shape':<14} {'method':<6} {'req/s':>9} {'p50, ms':>9} {'p99, ms':>9} {'bytes':>10} {'errors':>7}")
+
+    for shape in args.shapes.split(","):
+        path = f"/load/{shape}"
+        connection = Connection(host, port)
+        status, data = await connection.request("GET", f"{path}/data")
+        connection.close()
+        if status != 200:
+            raise SystemExit(f"{path}/data: HTTP {status} {data[:200]!r}")
+
+        query = f"render={args.render}{'&compact=true' if args.compact else ''}"
+        requests = (("GET", f"{path}?{query}", b""), ("POST", path, data))
+        extra = f"Accept-Encoding: {args.accept_encoding}\r\n" if args.accept_encoding else ""
+        for method, target, body in requests:
+            options = (args.concurrency, args.warmup, extra, args.revalidate and method == "GET")
+            await hammer(host, port, method, target, body, *options)
+            stats = await hammer(host, port, method, target, body, args.concurrency, args.duration, *options[2:])
+            results.append(result := summary(shape, method, stats, args.duration))
+            print(
+                f"{shape:<14} {method:<6} {result['rps']:>9.1f} {result['p50_ms']:>9.2f} {result['p99_ms']:>9.2f}"
+                f" {result['bytes']:>10.0f} {result['errors']:>7}",
+            )
+
+    return results
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def spawn_server(port: int, workers: int) -> subprocess.Popen:
+    command = [sys.executable, "-m", "uvicorn", "debug:app", "--port", str(port), "--workers", str(workers)]
+    server = subprocess.Popen(  # noqa: S603
+        [*command, "--log-level", "warning", "--no-access-log"],
+        cwd=Path(__file__).parent,
+        env=os.environ | {"PYTHONUNBUFFERED": "1"},
+    )
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return server
+        except OSError:
+            if server.poll() is not None:
+                raise SystemExit("uvicorn exited on start") from None
+            time.sleep(0.1)
+
+    server.terminate()
+    raise SystemExit("uvicorn did not start in 30 seconds")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="running debug app, ignored with --spawn")
+    parser.add_argument("--spawn", action="store_true", help="start the debug app with uvicorn on a free port")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers with --spawn")
+    parser.add_argument("--shapes", default=DEFAULT_SHAPES, help="comma separated `{shape}/{size}` list")
+    parser.add_argument("--render", default="tree", choices=("tree", "template", "cached"))
+    parser.add_argument("--compact", action="store_true", help="request forms without whitespace between tags")
+    parser.add_argument("--revalidate", action="store_true", help="send back ETags of GETs as If-None-Match")
+    parser.add_argument("--accept-encoding", default="", help="e.g. `gzip, br`; bytes are counted as received")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per shape and method")
+    parser.add_argument("--warmup", type=float, default=1.0, help="seconds per shape and method, not measured")
+    parser.add_argument("-o", "--output", help="write the results as json")
+    args = parser.parse_args()
+
+    server = None
+    if args.spawn:
+        host, port = "127.0.0.1", free_port()
+        server = spawn_server(port, args.workers)
+    else:
+        url = urlsplit(args.url)
+        host, port = url.hostname or "127.0.0.1", url.port or 80
+
+    try:
+        results = asyncio.run(run(args, host, port))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any
+
+from .tags import DummyTag, Tag
+
+_current: ContextVar["BudgetState | None"] = ContextVar("formgen_budget", default=None)
+
+
+class RenderBudgetExceeded(Exception):  # noqa: N818
+    def __init__(self, limit: str, value: int, where: str) -> None:
+        super().__init__(f"render budget exceeded: {limit} = {value} at {where}")
+        self.limit = limit
+        self.value = value
+        self.where = where
+
+
+@dataclass(frozen=True)
+class Budget:
+    max_depth: int | None = 32  # nested models / subforms
+    max_nodes: int | None = None  # tags of a render, counted roughly per field
+    max_bytes: int | None = None  # serialized output, checked by `BudgetState.render` / `BudgetState.limit`
+    # replace what is over the limit with a short `<pre>` fragment instead of raising `RenderBudgetExceeded`
+    placeholder: bool = False
+
+
+@dataclass
+class BudgetState:
+    budget: Budget
+    depth: int = 0
+    nodes: int = 0
+    bytes: int = 0  # noqa: A003
+
+    def exceeded(self, limit: str, value: int, where: str) -> Tag:
+        if not self.budget.placeholder:
+            raise RenderBudgetExceeded(limit, value, where)
+        return DummyTag(f"<pre> RENDER BUDGET EXCEEDED, {limit} = {value} at {where} </pre>")
+
+    def nested(self, where: str, build: Callable[..., Tag], *args: Any) -> Tag:
+        if (max_depth := self.budget.max_depth) is not None and self.depth >= max_depth:
+            return self.exceeded("max_depth", max_depth, where)
+
+        self.depth += 1
+        try:
+            return build(*args)
+        except RecursionError:
+            raise self.too_deep(where) from None
+        finally:
+            self.depth -= 1
+
+    def iter_nested(self, where: str, chunks: Iterator[str]) -> Iterator[str]:
+        if (max_depth := self.budget.max_depth) is not None and self.depth >= max_depth:
+            yield str(self.exceeded("max_depth", max_depth, where))
+            return
+
+        self.depth += 1
+        try:
+            yield from chunks
+        except RecursionError:
+            raise self.too_deep(where) from None
+        finally:
+            self.depth -= 1
+
+    def too_deep(self, where: str) -> RenderBudgetExceeded:
+        # the interpreter's recursion limit is a depth limit too, e.g. of a self-referencing model without
+        # `max_depth`; what was built so far is lost, so this raises even with `placeholder`
+        return RenderBudgetExceeded("max_depth", self.depth, where)
+
+    def spend(self, nodes: int, where: str) -> Tag | None:
+        # placeholder to put instead of the rest of the model, `None` while within the budget
+        self.nodes += nodes
+        if (max_nodes := self.budget.max_nodes) is not None and self.nodes > max_nodes:
+            return self.exceeded("max_nodes", max_nodes, where)
+        return None
+
+    def exhausted(self) -> bool:
+        # anything rendered from here on would only be a placeholder
+        max_depth, max_nodes = self.budget.max_depth, self.budget.max_nodes
+        return (max_depth is not None and self.depth >= max_depth) or (max_nodes is not None and self.nodes > max_nodes)
+
+    def limit(self, chunks: Iterator[str]) -> Iterator[str]:
+        # streamed output can't be taken back, so `max_bytes` raises here even with `placeholder`
+        max_bytes = self.budget.max_bytes
+        for chunk in chunks:
+            self.bytes += len(chunk.encode())
+            if max_bytes is not None and self.bytes > max_bytes:
+                raise RenderBudgetExceeded("max_bytes", max_bytes, "output")
+            yield chunk
+
+    def render(self, tag: Tag, compact: bool = False) -> str:
+        try:
+            return "".join(self.limit(tag.iter_render(compact)))
+        except RenderBudgetExceeded as ex:
+            if not self.budget.placeholder:
+                raise
+            return str(self.exceeded(ex.limit, ex.value, ex.where))
+
+
+def current_budget() -> BudgetState | None:
+    return _current.get()
+
+
+@contextmanager
+def render_budget(budget: Budget | None = None) -> Iterator[BudgetState]:
+    # forms generated inside the block (in this context) are checked against `budget`
+    state = BudgetState(budget=budget or Budget())
+    token = _current.set(state)
+    try:
+        yield state
+    finally:
+        _current.reset(token)
@@ -0,0 +1,370 @@
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any
+from weakref import WeakKeyDictionary
+
+from pydantic import BaseModel
+
+from .tags import DummyTag, Tag
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# bump whenever the generated markup changes, so fingerprints (ETags) of older output stop matching
+MARKUP_VERSION = 2
+
+# preferred first
+ENCODINGS: tuple[str, ...] = ("br", "gzip") if brotli else ("gzip",)
+
+_current: ContextVar["FragmentCache | None"] = ContextVar("formgen_fragment_cache", default=None)
+
+
+def current_fragment_cache() -> "FragmentCache | None":
+    return _current.get()
+
+
+@contextmanager
+def use_fragment_cache(cache: "FragmentCache") -> Iterator["FragmentCache"]:
+    # forms generated inside the block (in this context) reuse fragments stored in `cache`
+    token = _current.set(cache)
+    try:
+        yield cache
+    finally:
+        _current.reset(token)
+
+
+@dataclass(slots=True)
+class Fragment(DummyTag):
+    # a cached fragment, serialized both ways since it's cached before the render mode is known
+    compact_raw: str = ""
+
+    def iter_render(self, compact: bool = False) -> Iterator[str]:
+        yield self.compact_raw if compact else self.raw
+
+
+def compress(html: str) -> dict[str, bytes]:
+    raw = html.encode()
+    encodings = {"gzip": gzip.compress(raw, compresslevel=6, mtime=0)}
+    if brotli is not None:
+        encodings["br"] = brotli.compress(raw)
+    return encodings
+
+
+def choose_encoding(accept_encoding: str, available: tuple[str, ...] = ENCODINGS) -> str:
+    # best of `available` allowed by an Accept-Encoding header, "identity" if none is
+    weights: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        weight = 1.0
+        if (param := params.strip()).startswith("q="):
+            try:
+                weight = float(param[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name.strip().lower()] = weight
+
+    candidates = [(weights.get(name, weights.get("*", 0.0)), -i, name) for i, name in enumerate(available)]
+    if candidates and (best := max(candidates))[0] > 0:
+        return best[2]
+    return "identity"
+
+
+def value_key(value: Any) -> Hashable | None:
+    # stands for a bound value in fragment keys, `None` if the value can't be keyed
+    match value:
+        case BaseModel():
+            # field by field, with the runtime type of every nested value: a json dump goes by the declared types
+            # (subclass instances lose their own fields) and leaves out `exclude=True` fields, both still rendered
+            items = [value_key(getattr(value, name)) for name in type(value).model_fields]
+            items.append(value_key(value.model_extra or {}))
+            if None in items:
+                return None
+            return (type(value), tuple(items))
+        case list() | tuple() | set() | frozenset():
+            items = [value_key(item) for item in value]
+            if None in items:
+                return None
+            return (type(value), tuple(sorted(items, key=repr) if isinstance(value, set | frozenset) else items))
+        case dict():
+            return value_key(list(value.items()))
+        case None | bool() | int() | float() | str() | Enum():
+            # the type keeps 1, 1.0 and True apart
+            return (type(value), value)
+    # anything else only with a repr of its own, the digest of `stable_key` has to be the same in every process
+    # (`hash()` of str-based values isn't, object.__repr__ has an address in it)
+    if type(value).__repr__ is object.__repr__:
+        return None
+    try:
+        hash(value)
+    except TypeError:
+        return None
+    return (type(value), value)
+
+
+@dataclass(slots=True)
+class Entry:
+    html: str
+    compact_html: str | None
+    size: int
+    encodings: dict[str, bytes]
+
+    @classmethod
+    def make(cls, html: str, compact_html: str | None, encodings: dict[str, bytes]) -> "Entry":
+        size = len(html.encode()) + len((compact_html or "").encode()) + sum(map(len, encodings.values()))
+        return cls(html, compact_html, size, encodings)
+
+
+class FragmentCache:
+    # rendered fragments by key, least recently used ones are evicted once they take more than `max_bytes`.
+    # entries put with `compact_html` keep both serializations, those put with `encodings` (see `compress`) keep
+    # these too, for sending whole forms as is.
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024) -> None:
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._fragments: OrderedDict[Hashable, Entry] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _lookup(self, key: Hashable) -> Entry | None:
+        with self._lock:
+            if (fragment := self._fragments.get(key)) is None:
+                self.misses += 1
+                return None
+            self._fragments.move_to_end(key)
+            self.hits += 1
+            return fragment
+
+    def get(self, key: Hashable) -> str | None:
+        fragment = self._lookup(key)
+        return fragment.html if fragment is not None else None
+
+    def get_encoded(self, key: Hashable, accept_encoding: str = "") -> tuple[bytes, str] | None:
+        if (fragment := self._lookup(key)) is None:
+            return None
+        return pick_encoded(fragment.html, fragment.encodings, accept_encoding)
+
+    def put(
+        self,
+        key: Hashable,
+        html: str,
+        encodings: dict[str, bytes] | None = None,
+        compact_html: str | None = None,
+    ) -> None:
+        entry = Entry.make(html, compact_html, encodings or {})
+        if entry.size > self.max_bytes:
+            return
+
+        with self._lock:
+            if (old := self._fragments.pop(key, None)) is not None:
+                self.bytes -= old.size
+            self._fragments[key] = entry
+            self.bytes += entry.size
+            while self.bytes > self.max_bytes:
+                _, evicted = self._fragments.popitem(last=False)
+                self.bytes -= evicted.size
+                self.evictions += 1
+
+    def render(self, key: Hashable | None, build: Callable[..., Tag], *args: Any) -> Tag:
+        if key is None:
+            return build(*args)
+        # both serializations in one entry, they are looked up, stored and evicted together
+        if (fragment := self._lookup(key)) is not None and fragment.compact_html is not None:
+            return Fragment(fragment.html, fragment.compact_html)
+
+        tag = build(*args)
+        html, compact_html = str(tag), tag.render(compact=True)
+        self.put(key, html, compact_html=compact_html)
+        return Fragment(html, compact_html)
+
+    def render_encoded(
+        self,
+        key: Hashable,
+        build: Callable[..., Tag | str],
+        *args: Any,
+        accept_encoding: str = "",
+    ) -> tuple[bytes, str]:
+        # (body, content encoding); every encoding is computed once, when the entry is stored
+        if (encoded := self.get_encoded(key, accept_encoding)) is not None:
+            return encoded
+
+        html = str(build(*args))
+        encodings = compress(html)
+        self.put(key, html, encodings)
+        return pick_encoded(html, encodings, accept_encoding)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._fragments.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._fragments),
+            "bytes": self.bytes,
+        }
+
+
+def pick_encoded(html: str, encodings: dict[str, bytes], accept_encoding: str) -> tuple[bytes, str]:
+    encoding = choose_encoding(accept_encoding, tuple(name for name in ENCODINGS if name in encodings))
+    if encoding == "identity":
+        return html.encode(), encoding
+    return encodings[encoding], encoding
+
+
+_fingerprints: WeakKeyDictionary[type, str] = WeakKeyDictionary()
+
+
+def model_fingerprint(model_type: type[BaseModel]) -> str:
+    # changes whenever the model definition does, so fragments of an old definition are never hit again
+    if (fingerprint := _fingerprints.get(model_type)) is None:
+        try:
+            schema = json.dumps(model_type.model_json_schema(), sort_keys=True, default=str)
+        except Exception:  # noqa: BLE001, W0703 # arbitrary types etc.
+            schema = repr([(name, repr(field)) for name, field in model_type.model_fields.items()])
+        name = f"{model_type.__module__}.{model_type.__qualname__}"
+        fingerprint = _fingerprints[model_type] = hashlib.sha256(f"{name}\n{schema}".encode()).hexdigest()
+    return fingerprint
+
+
+def stable_key(key: Any) -> str:
+    # same digest for the same key in every process, types included
+    def dump(part: Any) -> str:
+        match part:
+            case type() if issubclass(part, BaseModel):
+                return f"model:{model_fingerprint(part)}"
+            case type():
+                return f"type:{part.__module__}.{part.__qualname__}"
+            case Enum():
+                return f"enum:{dump(type(part))}:{part.name}"
+            case tuple() | list():
+                return "(" + ",".join(map(dump, part)) + ")"
+        return repr(part)
+
+    return hashlib.sha256(dump(key).encode()).hexdigest()
+
+
+# seconds, how stale the last use time of a shared fragment may get
+USED_RESOLUTION = 10
+
+
+class SqliteFragmentCache(FragmentCache):
+    # fragments in a local sqlite database, shared by every process that opens the same file.
+    # hit / miss counters are per process, entries and bytes are the database's.
+    def __init__(self, path: str | os.PathLike, max_bytes: int = 256 * 1024 * 1024) -> None:
+        FragmentCache.__init__(self, max_bytes=max_bytes)
+        self.path = os.fspath(path)
+        self._local = threading.local()
+
+        with self._connection() as connection:
+            connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS fragments (
+                    key TEXT PRIMARY KEY, html TEXT, size INTEGER, used REAL, gzip BLOB, br BLOB, compact TEXT
+                );
+                CREATE INDEX IF NOT EXISTS fragments_used ON fragments (used);
+                CREATE TABLE IF NOT EXISTS total (id INTEGER PRIMARY KEY CHECK (id = 0), size INTEGER);
+                INSERT OR IGNORE INTO total VALUES (0, 0);
+                CREATE TRIGGER IF NOT EXISTS fragments_insert AFTER INSERT ON fragments
+                    BEGIN UPDATE total SET size = size + new.size; END;
+                CREATE TRIGGER IF NOT EXISTS fragments_delete AFTER DELETE ON fragments
+                    BEGIN UPDATE total SET size = size - old.size; END;
+                """,
+            )
+            # files created before encodings / compact markup were stored
+            columns = {row[1] for row in connection.execute("PRAGMA table_info(fragments)")}
+            for column, column_type in (("gzip", "BLOB"), ("br", "BLOB"), ("compact", "TEXT")):
+                if column not in columns:
+                    connection.execute(f"ALTER TABLE fragments ADD COLUMN {column} {column_type}")
+
+        # fragments of older markup (e.g. unescaped values) must never be served, the file keeps the version
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            (version,) = connection.execute("PRAGMA user_version").fetchone()
+            if version != MARKUP_VERSION:
+                connection.execute("DELETE FROM fragments")
+                connection.execute(f"PRAGMA user_version = {MARKUP_VERSION}")
+
+    def _connection(self) -> sqlite3.Connection:
+        # one connection per thread, and a fresh one after a fork
+        if getattr(self._local, "pid", None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return self._local.connection
+
+    def _lookup(self, key: Hashable) -> Entry | None:
+        connection = self._connection()
+        digest = stable_key(key)
+        query = "SELECT html, compact, size, used, gzip, br FROM fragments WHERE key = ?"
+        if (row := connection.execute(query, (digest,)).fetchone()) is None:
+            self.misses += 1
+            return None
+
+        html, compact_html, size, used, *encoded = row
+        # a write per hit would serialize every reader, recency only has to be roughly right
+        if (now := time.time()) - used > USED_RESOLUTION:
+            connection.execute("UPDATE fragments SET used = ? WHERE key = ?", (now, digest))
+        self.hits += 1
+        encodings = {name: data for name, data in zip(("gzip", "br"), encoded) if data is not None}
+        return Entry(html, compact_html, size, encodings)
+
+    def put(
+        self,
+        key: Hashable,
+        html: str,
+        encodings: dict[str, bytes] | None = None,
+        compact_html: str | None = None,
+    ) -> None:
+        entry = Entry.make(html, compact_html, encodings or {})
+        if entry.size > self.max_bytes:
+            return
+
+        digest = stable_key(key)
+        encoded = (entry.encodings.get("gzip"), entry.encodings.get("br"))
+        row = (digest, html, entry.size, time.time(), *encoded, compact_html)
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute("DELETE FROM fragments WHERE key = ?", (digest,))
+            query = "INSERT INTO fragments (key, html, size, used, gzip, br, compact) VALUES (?, ?, ?, ?, ?, ?, ?)"
+            connection.execute(query, row)
+            (total,) = connection.execute("SELECT size FROM total").fetchone()
+            while total > self.max_bytes:
+                oldest = "SELECT key FROM fragments ORDER BY used LIMIT 1"
+                connection.execute(f"DELETE FROM fragments WHERE key = ({oldest})")  # noqa: S608
+                self.evictions += 1
+                (total,) = connection.execute("SELECT size FROM total").fetchone()
+
+    def clear(self) -> None:
+        with self._connection() as connection:
+            connection.execute("DELETE FROM fragments")
+
+    def stats(self) -> dict[str, int]:
+        entries, size = self._connection().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM fragments").fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": size,
+        }
@@ -1,22 +1,34 @@
 # ruff: noqa: PLR0911, PLR0913
 
-from dataclasses import dataclass
+import hashlib
+import json
+import threading
+import uuid
+from collections import OrderedDict
+from collections.abc import Mapping
+from dataclasses import dataclass, field
 from typing import Any
+from ..budget import BudgetState, current_budget
+from ..fragments import MARKUP_VERSION, Fragment, stable_key, value_key
+from ..instrument import current_profiler
 from ..tags import (
     ButtonTag,
     DivTag,
     DummyTag,
     InputTag,
     LabelTag,
+    OptionList,
     OptionTag,
     PTag,
+    SelectedOptions,
     SelectTag,
     Tag,
     Tags,
     TextareaTag,
     FormTag,
+    escape,
 )
-from .schema import Model, Property, AdditionalProperty, Types, Formats, VAL
+from .schema import Model, Property, AdditionalProperty, Types, Formats, VAL, LazyDefinitions
 
 
 @dataclass
@@ -26,6 +38,69 @@ class Context:
     overrides: dict[str, "str | Context"]
 
 
+@dataclass
+class SchemaIndex:
+    definitions: Mapping[str, Model]
+    # raw "$ref" string -> definition name
+    refs: dict[str, str]
+    # markup of definition subforms (normal, compact), keyed by (definition name, prop_name_root)
+    subforms: dict[tuple[str, str], tuple[str, str]]
+    # options of enum definitions by definition name, `None` for enums of unhashable values
+    options: dict[str, OptionList | None] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, schema: Model, definitions: LazyDefinitions | None = None) -> "SchemaIndex":
+        # lazy definitions are indexed on first use only, eager ones up front
+        models = (schema,) if definitions is not None else (schema, *schema.definitions.values(), *schema.defs.values())
+        definitions = definitions if definitions is not None else schema.definitions | schema.defs
+
+        refs: dict[str, str] = {}
+        for model in models:
+            for prop in model.properties.values():
+                raw_refs = [prop.ref, (prop.items or {}).get("$ref")]
+                raw_refs += [raw_ref.get("$ref") for raw_ref in (prop.all_of or []) + (prop.any_of or [])]
+                for raw_ref in filter(None, raw_refs):
+                    refs[raw_ref] = raw_ref.split("/")[-1]
+
+        return cls(definitions=definitions, refs=refs, subforms={})
+
+    def resolve(self, raw_ref: str) -> tuple[str, Model | None]:
+        if (ref := self.refs.get(raw_ref)) is None:
+            ref = self.refs[raw_ref] = raw_ref.split("/")[-1]
+        return ref, self.definitions.get(ref)
+
+    def subform(self, ref: str, defin: Model, prop_name_root: str) -> Tag:
+        # definition subforms don't get values, so the same one can be reused by every render
+        if current_budget() is not None:
+            # ... unless this render has a budget, which counts the depth and nodes of every subform
+            return generate_form_inner(schema=defin, prop_name_root=prop_name_root, index=self)
+        if (markup := self.subforms.get((ref, prop_name_root))) is None:
+            form = generate_form_inner(schema=defin, prop_name_root=prop_name_root, index=self)
+            # concurrent renders may build the same subform, every one of them keeps the first stored copy
+            markup = self.subforms.setdefault((ref, prop_name_root), (str(form), form.render(compact=True)))
+        # markup rather than the tags, so a caller editing its form can't change the forms of later renders
+        return Fragment(*markup)
+
+    def enum_options(self, ref: str, enum: list, default: VAL) -> list[OptionTag] | Tag:
+        if ref not in self.options:
+            try:
+                options = OptionList.build(enum)
+            except TypeError:
+                options = None
+            self.options.setdefault(ref, options)
+
+        if (options := self.options[ref]) is None:
+            return [OptionTag(value=enum_val, selected=enum_val == default) for enum_val in enum]
+        return SelectedOptions(options, options.select(default))
+
+
+def index_for(schema: Model) -> SchemaIndex:
+    # a race only builds the index twice; the loser's copy is still complete and is used by that one render
+    if schema._index is None:  # noqa: SLF001
+        schema._index = SchemaIndex.build(schema)  # noqa: SLF001
+    return schema._index  # noqa: SLF001
+
+
 def get_input(
     prop_name: str,
     prop: Property,
@@ -33,7 +108,25 @@ def get_input(
     schema: Model,
     value: VAL = None,
     type_override: Types | None = None,
+    index: SchemaIndex | None = None,
+) -> Tag:
+    if (profiler := current_profiler()) is not None:
+        input_type = (type_override if type_override else prop.type).name
+        args = (prop_name, prop, attribs, schema, value, type_override, index)
+        return profiler.measure(input_type, prop_name, make_input, *args)
+    return make_input(prop_name, prop, attribs, schema, value, type_override, index)
+
+
+def make_input(
+    prop_name: str,
+    prop: Property,
+    attribs: dict,
+    schema: Model,
+    value: VAL = None,
+    type_override: Types | None = None,
+    index: SchemaIndex | None = None,
 ) -> Tag:
+    index = index or index_for(schema)
     title = prop.title or prop_name
     input_type: Types = type_override if type_override else prop.type
     inner_value = (
@@ -80,32 +173,22 @@ def get_input(
                 return DummyTag(f"ARRAY_BROKE: {prop}")
 
             if "$ref" in prop.items:
-                ref: str = prop.items["$ref"].split("/")[-1]
-                if ref not in schema.definitions:
+                ref, defin = index.resolve(prop.items["$ref"])
+                if defin is None:
                     return DummyTag(f"_NO_REF_IN_DEF_{ ref }_; {prop}")
 
-                defin = schema.definitions[ref]
-                defin.definitions = schema.definitions
-
                 if enum := defin.enum:
-                    default = prop.default
                     return SelectTag(
                         class_="form-select form-select-multiple",
-                        options=[
-                            OptionTag(
-                                value=enum_val,
-                                selected=enum_val == default,
-                            )
-                            for enum_val in enum
-                        ],
+                        options=index.enum_options(ref, enum, prop.default),
                         multiple=True,
                     )
             else:
                 return DummyTag("NOT SUPPORTED_ARRAY")
 
         case Types.html:
-            # FIXME: make this safe!
-            safe_inner_value = DummyTag(str(inner_value))
+            # shown as text; only `Markup` is trusted to be html
+            safe_inner_value = DummyTag(escape(inner_value, quote=False))
             inp = InputTag(
                 class_="form-control",
                 type_="hidden",
@@ -141,23 +224,18 @@ def get_input(
             raw_divs: list = []
 
             for raw_ref in prop.any_of:
-                ref: str = raw_ref["$ref"].split("/")[-1]
-                if ref not in schema.definitions:
+                ref, defin = index.resolve(raw_ref["$ref"])
+                if defin is None:
                     raw_opts.append(OptionTag(value=f"WTF WTF: {raw_ref}"))
                     continue
 
-                defin = schema.definitions[ref]
-                defin.definitions = schema.definitions
                 selected = (
                     inner_value["classtype"] == ref
                     if isinstance(inner_value, dict) and "classtype" in inner_value
                     else False
                 )
 
-                inner_form = generate_form_inner(
-                    schema=defin,
-                    prop_name_root=prop_name,
-                )
+                inner_form = index.subform(ref, defin, prop_name)
                 raw_opts.append(
                     OptionTag(
                         value=ref,
@@ -198,30 +276,17 @@ def get_input(
             raw_ref = prop.some_ref
             if raw_ref is None:
                 return DummyTag(f"_NOT_KNOWN_TYPE_{ input_type }_; {prop}")
-            ref: str = raw_ref.split("/")[-1]
-            if ref not in schema.definitions:
+            ref, defin = index.resolve(raw_ref)
+            if defin is None:
                 return DummyTag(f"_NO_REF_IN_DEF_{ ref }_; {prop}")
 
-            defin = schema.definitions[ref]
-            defin.definitions = schema.definitions
-
             if enum := defin.enum:
-                default = prop.default
                 return SelectTag(
                     class_="form-select",
-                    options=[
-                        OptionTag(
-                            value=enum_val,
-                            selected=enum_val == default,
-                        )
-                        for enum_val in enum
-                    ],
+                    options=index.enum_options(ref, enum, prop.default),
                 )
 
-            return generate_form_inner(
-                schema=defin,
-                prop_name_root=prop_name,
-            )
+            return index.subform(ref, defin, prop_name)
 
     return DummyTag(ret)
 
@@ -232,11 +297,28 @@ def generate_form_inner(
     overrides: dict | None = None,
     attribs: dict | None = None,
     prop_name_root: str | None = None,
+    index: SchemaIndex | None = None,
 ) -> Tag:
+    index = index or index_for(schema)
     values = values or {}
     overrides = overrides or {}
     attribs = attribs or {}
 
+    args = (schema, values, overrides, attribs, prop_name_root, index)
+    if (budget := current_budget()) is not None:
+        return budget.nested(prop_name_root or schema.title, generate_fields, *args, budget)
+    return generate_fields(*args)
+
+
+def generate_fields(
+    schema: Model,
+    values: dict,
+    overrides: dict,
+    attribs: dict,
+    prop_name_root: str | None,
+    index: SchemaIndex,
+    budget: BudgetState | None = None,
+) -> Tag:
     tags = []
     # {% set args = {
     #     "prop_name": (prop_name_root + "." if prop_name_root else "") + prop_name,
@@ -250,6 +332,10 @@ def generate_form_inner(
     #     {% set _ = args.update(attribs=args["attribs"] + ["required"]) %}
     # {% endif %}
     for prop_name, prop in schema.properties.items():
+        if budget is not None and (placeholder := budget.spend(5, prop_name)):
+            tags.append(placeholder)
+            break
+
         input_body = get_input(
             prop_name=(prop_name_root + "." if prop_name_root else "") + prop_name,
             prop=prop,
@@ -257,6 +343,7 @@ def generate_form_inner(
             schema=schema,
             value=values.get(prop_name, None),
             type_override=overrides.get(prop_name, None),
+            index=index,
         )
 
         label = LabelTag(class_="col-2 col-form-label", label=prop.title or prop_name)
@@ -266,19 +353,90 @@ def generate_form_inner(
     return Tags(tags)
 
 
+SCHEMA_CACHE_SIZE = 32
+
+_parsed_schemas: OrderedDict[tuple[str, bool], Model] = OrderedDict()
+# the same parses by document identity; an entry holds its document, so the id can't be reused while it's cached
+_parsed_documents: OrderedDict[tuple[int, bool], tuple[dict, Model]] = OrderedDict()
+# parsed schemas are never mutated by rendering, the lock only keeps the LRU order consistent between threads
+_parsed_schemas_lock = threading.Lock()
+
+
+def schema_fingerprint(raw_schema: dict) -> str:
+    dumped = json.dumps(raw_schema, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(dumped.encode()).hexdigest()
+
+
+def remember(cache: OrderedDict, key: Any, value: Any) -> Any:
+    # stores `value` unless a racing parse did first, evicts the least recently used; the lock has to be held
+    value = cache.setdefault(key, value)
+    cache.move_to_end(key)
+    while len(cache) > SCHEMA_CACHE_SIZE:
+        cache.popitem(last=False)
+    return value
+
+
+def parsed_document(raw_schema: dict, lazy: bool = False) -> Model | None:
+    document_key = (id(raw_schema), lazy)
+    with _parsed_schemas_lock:
+        if (known := _parsed_documents.get(document_key)) is not None and known[0] is raw_schema:
+            _parsed_documents.move_to_end(document_key)
+            return known[1]
+    return None
+
+
+def parse_schema(raw_schema: dict, lazy: bool = False) -> Model:
+    # a document seen before (the same dict object) is found by identity, at a cost independent of its size;
+    # it must not be changed in place after that, pass a new dict instead.
+    # an equal document in a new object (e.g. `json.loads` per request) is found by fingerprint, which dumps
+    # and hashes the whole document every call: callers should keep the returned Model and render from it.
+    if (known := parsed_document(raw_schema, lazy)) is not None:
+        return known
+
+    document_key = (id(raw_schema), lazy)
+    key = (schema_fingerprint(raw_schema), lazy)
+    with _parsed_schemas_lock:
+        if (parsed_schema := _parsed_schemas.get(key)) is not None:
+            _parsed_schemas.move_to_end(key)
+            remember(_parsed_documents, document_key, (raw_schema, parsed_schema))
+            return parsed_schema
+
+    if lazy:
+        # only the root is validated now, definitions are parsed when a form first references them
+        raw_definitions = raw_schema.get("definitions", {}) | raw_schema.get("$defs", {})
+        parsed_schema = Model.parse_obj({k: v for k, v in raw_schema.items() if k not in ("definitions", "$defs")})
+        parsed_schema._index = SchemaIndex.build(parsed_schema, LazyDefinitions(raw_definitions))  # noqa: SLF001
+    else:
+        parsed_schema = Model.parse_obj(raw_schema)
+    parsed_schema._fingerprint = key[0]  # noqa: SLF001
+
+    with _parsed_schemas_lock:
+        parsed_schema = remember(_parsed_schemas, key, parsed_schema)
+        remember(_parsed_documents, document_key, (raw_schema, parsed_schema))
+    return parsed_schema
+
+
+def clear_schema_cache() -> None:
+    with _parsed_schemas_lock:
+        _parsed_schemas.clear()
+        _parsed_documents.clear()
+
+
 def generate_form(
-    raw_schema: dict,
+    raw_schema: dict | Model,
     form_id: str = "",
     form_class: str = "",
     values: dict | None = None,
     overrides: dict | None = None,
     attribs: dict | None = None,
+    lazy: bool = False,
 ) -> Tag:
     values = values or {}
     overrides = overrides or {}
     attribs = attribs or {}
 
-    parsed_schema = Model.parse_obj(raw_schema)
+    # an already parsed schema skips validation completely
+    parsed_schema = raw_schema if isinstance(raw_schema, Model) else parse_schema(raw_schema, lazy=lazy)
 
     form_body = generate_form_inner(
         schema=parsed_schema,
@@ -300,3 +458,27 @@ def generate_form(
             ),
         ],
     )
+
+
+def form_fingerprint(
+    raw_schema: dict | Model,
+    form_id: str = "",
+    form_class: str = "",
+    values: dict | None = None,
+    overrides: dict | None = None,
+    attribs: dict | None = None,
+) -> str:
+    # same for every `generate_form` call that produces the same markup, without rendering anything; usable as ETag.
+    # a Model is fingerprinted once, from the document it was parsed from, so it must not be changed afterwards
+    if not isinstance(raw_schema, Model):
+        # the digest `parse_schema` keys it by, so a document and its parsed Model get the same fingerprint
+        parsed = parsed_document(raw_schema) or parsed_document(raw_schema, lazy=True)
+        schema = parsed._fingerprint if parsed is not None else schema_fingerprint(raw_schema)  # noqa: SLF001
+    elif (schema := raw_schema._fingerprint) is None:  # noqa: SLF001
+        # made by the caller rather than `parse_schema`
+        schema = raw_schema._fingerprint = schema_fingerprint(raw_schema.model_dump(by_alias=True))  # noqa: SLF001
+
+    if (bound := value_key((values or {}, overrides or {}, attribs or {}))) is None:
+        # a repr can leave out values or hold addresses, so values that can't be keyed never match
+        bound = uuid.uuid4().hex
+    return stable_key((MARKUP_VERSION, schema, form_id, form_class, bound))
@@ -1,8 +1,9 @@
 # ruff: noqa: A003
 
+from collections.abc import Iterator, Mapping
 from enum import Enum
-from typing import TypeAlias
-from pydantic import BaseModel, Field
+from typing import Any, TypeAlias
+from pydantic import BaseModel, Field, PrivateAttr
 
 VAL: TypeAlias = dict | list | str | bool | None
 
@@ -38,27 +39,27 @@ class AdditionalProperty(BaseModel):
 
 
 class Property(BaseModel):
-    title: str | None
+    title: str | None = None
     type: Types = Types.unknown
 
-    format: Formats | None
-    default: VAL
+    format: Formats | None = None
+    default: VAL = None
 
-    any_of: list[dict[str, str]] | None = Field(alias="anyOf")
+    any_of: list[dict[str, str]] | None = Field(default=None, alias="anyOf")
 
-    additional_properties: AdditionalProperty | None = Field(alias="additionalProperties")
+    additional_properties: AdditionalProperty | None = Field(default=None, alias="additionalProperties")
 
-    enum: list[str] | None  # fake
+    enum: list[str] | None = None  # fake
 
-    unique_items: bool | None = Field(alias="uniqueItems")
+    unique_items: bool | None = Field(default=None, alias="uniqueItems")
 
-    const: str | None
+    const: str | None = None
 
-    ref: str | None = Field(alias="$ref")
+    ref: str | None = Field(default=None, alias="$ref")
 
-    all_of: list[dict[str, str]] | None = Field(alias="allOf")
+    all_of: list[dict[str, str]] | None = Field(default=None, alias="allOf")
 
-    items: dict[str, str] | None
+    items: dict[str, str] | None = None
 
     @property
     def some_ref(self) -> str | None:
@@ -74,12 +75,39 @@ class Model(BaseModel):
     title: str
     type: Types
 
-    description: str | None
+    description: str | None = None
 
     properties: dict[str, Property] = {}
 
-    enum: list[str] | None
+    enum: list[str] | None = None
 
     required: list[str] = []
 
     definitions: dict[str, "Model"] = {}
+    defs: dict[str, "Model"] = Field(default={}, alias="$defs")  # pydantic v2 layout
+
+    # gen1.SchemaIndex, built on the first render of this schema
+    _index: Any = PrivateAttr(default=None)
+    # digest of the document, set by gen1.parse_schema or on the first gen1.form_fingerprint
+    _fingerprint: str | None = PrivateAttr(default=None)
+
+
+class LazyDefinitions(Mapping[str, Model]):
+    # parses a definition on its first lookup, for documents with far more definitions than a form uses
+    def __init__(self, raw_definitions: dict[str, dict]) -> None:
+        self.raw_definitions = raw_definitions
+        self.parsed: dict[str, Model] = {}
+
+    def __getitem__(self, name: str) -> Model:
+        if (model := self.parsed.get(name)) is None:
+            model = self.parsed.setdefault(name, Model.parse_obj(self.raw_definitions[name]))
+        return model
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.raw_definitions
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.raw_definitions)
+
+    def __len__(self) -> int:
+        return len(self.raw_definitions)
@@ -1,14 +1,19 @@
+import threading
 import types
 import typing
 import uuid
 from dataclasses import dataclass, field
 from enum import Enum, auto
 from typing import Any, Self, Type, TypeVar, get_args, get_origin
+from weakref import WeakKeyDictionary
 
 from pydantic import BaseModel
 from pydantic.fields import FieldInfo
 from pydantic_core._pydantic_core import PydanticUndefined
 
+from ..budget import BudgetState, current_budget
+from ..fragments import MARKUP_VERSION, current_fragment_cache, stable_key, value_key
+from ..instrument import Profiler, current_profiler
 from ..tags import (
     ButtonTag,
     DivTag,
@@ -16,12 +21,16 @@ from ..tags import (
     FormTag,
     InputTag,
     LabelTag,
+    Markup,
+    OptionList,
     OptionTag,
     PTag,
+    SelectedOptions,
     SelectTag,
     Tag,
     Tags,
     TextareaTag,
+    escape,
 )
 
 PydanticModel = TypeVar("PydanticModel", bound=BaseModel)
@@ -100,6 +109,8 @@ class FieldType(Enum):
 class Context:
     attributes: dict[str, str | None] = field(default_factory=dict)
     override: FieldType = FieldType.UNKNOWN
+    # FieldType.HTML values are shown as html rather than text; only for values that are already sanitized
+    trusted_html: bool = False
 
 
 @dataclass(frozen=True)
@@ -114,7 +125,7 @@ def generate_form(
     form_class: str = "",
     readonly: bool = False,
     disabled_fields: list[str] | None = None,
-    contexts: Contexts = Contexts(),
+    contexts: Contexts | None = None,
 ) -> Tag:
     form_body = generate_form_inner(
         model_type=model_type,
@@ -124,6 +135,38 @@ def generate_form(
         contexts=contexts,
     )
 
+    return make_form(form_body, form_id=form_id, form_class=form_class)
+
+
+def form_fingerprint(
+    model_type: Type[PydanticModel],
+    model: PydanticModel | None = None,
+    form_id: str = "",
+    form_class: str = "",
+    readonly: bool = False,
+    disabled_fields: list[str] | None = None,
+    contexts: Contexts | None = None,
+) -> str:
+    # same for every `generate_form` call that produces the same markup, without rendering anything; usable as ETag
+    if (bound := value_key(model)) is None and model is not None:
+        # a repr can leave out values or hold addresses, so a model that can't be keyed never matches
+        bound = uuid.uuid4().hex
+
+    return stable_key(
+        (
+            MARKUP_VERSION,
+            type(model) if model else model_type,
+            bound,
+            form_id,
+            form_class,
+            readonly,
+            tuple(disabled_fields or []),
+            contexts_key(contexts),
+        ),
+    )
+
+
+def make_form(form_body: Tag, form_id: str = "", form_class: str = "") -> Tag:
     return FormTag(
         id=form_id,
         class_=form_class,
@@ -139,42 +182,245 @@ def generate_form(
     )
 
 
+@dataclass
+class FieldPlan:
+    field: FieldInfo
+    field_last: str
+    field_name: str
+    field_type: FieldType
+
+    label: str
+    div_id: str
+
+    readonly: bool
+    disabled_fields: list[str]
+    disabled: bool | None
+    extra_attrs: dict[str, str | None]
+    contexts: Contexts
+
+    is_optional: bool = False
+    trusted_html: bool = False
+    args: tuple[Any, ...] = ()
+    enum_options: OptionList | None = None
+    # everything but the bound value that the rendered field depends on, for fragment cache keys
+    options_key: tuple = ()
+
+    # plans of submodels, keyed by the type that is actually rendered
+    nested: dict[type, "ModelPlan"] = field(default_factory=dict)
+
+    def nested_plan(self, model_type: Type[BaseModel]) -> "ModelPlan":
+        if (plan := self.nested.get(model_type)) is None:
+            # union variants are rendered editable, plain submodels inherit readonly / disabled fields
+            inherit = self.field_type == FieldType.NESTED_MODEL
+            plan = compile_model_plan(
+                model_type=model_type,
+                field_name_root=self.field_name,
+                readonly=self.readonly if inherit else False,
+                disabled_fields=self.disabled_fields if inherit else None,
+                contexts=self.contexts,
+            )
+            # concurrent renders may race here, all of them end up with the first stored plan
+            plan = self.nested.setdefault(model_type, plan)
+        return plan
+
+
+@dataclass(eq=False)
+class ModelPlan:
+    model_type: Type[BaseModel]
+    fields: list[FieldPlan]
+
+
+MODEL_PLAN_CACHE_SIZE = 1024
+
+_model_plans: dict[tuple, ModelPlan] = {}
+# plans are immutable once built; the lock only guards insertion and eviction, compiling happens outside of it
+_model_plans_lock = threading.Lock()
+
+
+_enum_options: WeakKeyDictionary[type[Enum], OptionList] = WeakKeyDictionary()
+_enum_options_lock = threading.Lock()
+
+
+def options_for(enum: type[Enum]) -> OptionList:
+    # rendered options are shared by every field of this enum, in every form
+    if (options := _enum_options.get(enum)) is None:
+        options = OptionList.build(tuple(enum._member_map_.values()))  # noqa: SLF001, W0212 # i know.
+        with _enum_options_lock:
+            options = _enum_options.setdefault(enum, options)
+    return options
+
+
+def contexts_key(contexts: Context | Contexts | None) -> tuple:
+    match contexts:
+        case Context():
+            return (tuple(contexts.attributes.items()), contexts.override, contexts.trusted_html)
+        case Contexts():
+            return tuple((name, contexts_key(context)) for name, context in contexts.contexts.items())
+    return ()
+
+
+def compile_field_plan(
+    field_name: str,
+    field: FieldInfo,
+    field_name_root: str | None = None,
+    readonly: bool = False,
+    disabled_fields: list[str] | None = None,
+    context: Context | Contexts | None = None,
+) -> FieldPlan:
+    disabled_fields = disabled_fields or []
+
+    field_last = field.alias or field_name
+    full_field_name = (field_name_root + "." if field_name_root else "") + field_last
+
+    is_optional = check_for_optional(field.annotation) if field.annotation else False
+
+    field_type = context.override if isinstance(context, Context) else FieldType.UNKNOWN
+    if field_type == FieldType.UNKNOWN and field.annotation and not is_optional:
+        field_type = FieldType.resolve_type(field)
+
+    enum_options: OptionList | None = None
+    if field_type == FieldType.ENUM and issubclass(field.annotation, Enum):
+        enum_options = options_for(field.annotation)
+    if field_type == FieldType.ENUM_LIST and issubclass((enum := get_args(field.annotation)[0]), Enum):
+        enum_options = options_for(enum)
+
+    return FieldPlan(
+        field=field,
+        field_last=field_last,
+        field_name=full_field_name,
+        field_type=field_type,
+        label=field_name.replace("_", " ").capitalize(),
+        div_id=("div_" + full_field_name).replace(".", "__"),
+        readonly=readonly,
+        disabled_fields=disabled_fields,
+        disabled=True if readonly or (full_field_name in disabled_fields) else None,
+        extra_attrs=context.attributes if isinstance(context, Context) else {},
+        contexts=context if isinstance(context, Contexts) else Contexts(),
+        is_optional=is_optional,
+        trusted_html=context.trusted_html if isinstance(context, Context) else False,
+        args=get_args(field.annotation) if field.annotation else (),
+        enum_options=enum_options,
+        options_key=(
+            field_type,
+            readonly,
+            tuple(disabled_fields),
+            tuple(context.attributes.items()) if isinstance(context, Context) else (),
+            contexts_key(context),
+        ),
+    )
+
+
+def compile_model_plan(
+    model_type: Type[BaseModel],
+    field_name_root: str | None = None,
+    readonly: bool = False,
+    disabled_fields: list[str] | None = None,
+    contexts: Contexts | None = None,
+) -> ModelPlan:
+    disabled_fields = disabled_fields or []
+    contexts = contexts or Contexts()
+    key = (model_type, field_name_root, readonly, tuple(disabled_fields), contexts_key(contexts))
+
+    if (plan := _model_plans.get(key)) is not None:
+        return plan
+
+    plan = ModelPlan(
+        model_type=model_type,
+        fields=[
+            compile_field_plan(
+                field_name=field_name,
+                field=field,
+                field_name_root=field_name_root,
+                readonly=readonly,
+                disabled_fields=disabled_fields,
+                context=contexts.contexts.get(field_name, None),
+            )
+            for field_name, field in model_type.model_fields.items()
+        ],
+    )
+
+    with _model_plans_lock:
+        if (cached := _model_plans.get(key)) is not None:
+            return cached
+        if len(_model_plans) >= MODEL_PLAN_CACHE_SIZE:
+            _model_plans.pop(next(iter(_model_plans)))
+        _model_plans[key] = plan
+    return plan
+
+
+def clear_plan_cache() -> None:
+    with _model_plans_lock:
+        _model_plans.clear()
+
+
 def generate_form_inner(
     model_type: Type[PydanticModel],
     model: PydanticModel | None = None,
     field_name_root: str | None = None,
     readonly: bool = False,
     disabled_fields: list[str] | None = None,
-    contexts: Contexts = Contexts(),
+    contexts: Contexts | None = None,
 ) -> Tag:
+    plan = compile_model_plan(
+        model_type=type(model) if model else model_type,
+        field_name_root=field_name_root,
+        readonly=readonly,
+        disabled_fields=disabled_fields,
+        contexts=contexts,
+    )
+    return render_model_plan(plan, model)
+
+
+def render_model_plan(plan: ModelPlan, model: BaseModel | None = None) -> Tag:
+    if (budget := current_budget()) is not None:
+        return budget.nested(plan.model_type.__name__, render_plan_fields, plan, model, budget)
+    return render_plan_fields(plan, model)
+
+
+def render_plan_fields(plan: ModelPlan, model: BaseModel | None = None, budget: BudgetState | None = None) -> Tag:
+    profiler = current_profiler()
+    cache = current_fragment_cache()
     tags = []
-    disabled_fields = disabled_fields or []
 
-    for field_name, field in (model if model else model_type).model_fields.items():
-        input_body = get_input(
-            model_type=model_type,
-            model=model,
-            field_name=field_name,
-            field=field,
-            field_name_root=field_name_root,
-            readonly=readonly,
-            disabled_fields=disabled_fields,
-            context=contexts.contexts.get(field_name, None),
-        )
-
-        fancy_field_name = field_name.replace("_", " ").capitalize()
-        label = LabelTag(class_="col-2 col-form-label", label=fancy_field_name)
-        div0 = DivTag(class_="col", tags=[input_body])
-
-        _div_id_p_0 = field_name_root + "." if field_name_root else ""
-        _dir_id_p_1 = field.alias or field_name
-        div_id = ("div_" + _div_id_p_0 + _dir_id_p_1).replace(".", "__")
-
-        div = DivTag(class_="form-group row", tags=[label, div0], id=div_id)
-        tags.append(PTag(class_="my-1", tags=[div]))
+    for field_plan in plan.fields:
+        if budget is not None:
+            # p > div > (label, div > input), plus the options of enums
+            options = len(field_plan.enum_options.values) if field_plan.enum_options else 0
+            if placeholder := budget.spend(5 + options, field_plan.field_name):
+                tags.append(placeholder)
+                break
+
+        # a cached field would skip `budget.spend` for its nested models, or keep their placeholders
+        if cache is None or budget is not None:
+            tags.append(render_field(field_plan, model, profiler))
+        else:
+            key = fragment_key(plan, field_plan, model)
+            tags.append(cache.render(key, render_field, field_plan, model, profiler))
     return Tags(tags)
 
 
+def render_field(field_plan: FieldPlan, model: BaseModel | None = None, profiler: Profiler | None = None) -> Tag:
+    if profiler is None:
+        input_body = bind_input(field_plan, model)
+    else:
+        field_type = field_plan.field_type.name
+        input_body = profiler.measure(field_type, field_plan.field_name, bind_input, field_plan, model)
+    return wrap_input(field_plan, input_body)
+
+
+def fragment_key(plan: ModelPlan, field_plan: FieldPlan, model: BaseModel | None) -> tuple | None:
+    if (bound := value_key(bind_value(field_plan, model))) is None:
+        return None
+    return (plan.model_type, field_plan.field_name, field_plan.options_key, bound)
+
+
+def wrap_input(field_plan: FieldPlan, input_body: Tag) -> Tag:
+    label = LabelTag(class_="col-2 col-form-label", label=field_plan.label)
+    div0 = DivTag(class_="col", tags=[input_body])
+    div = DivTag(class_="form-group row", tags=[label, div0], id=field_plan.div_id)
+    return PTag(class_="my-1", tags=[div])
+
+
 def check_for_optional(annotation: type) -> bool:
     origin = get_origin(annotation)
     args = get_args(annotation)
@@ -198,63 +444,117 @@ def get_input(
     disabled_fields: list[str] | None = None,
     context: Context | Contexts | None = None,
 ) -> Tag:
-    ret = "fallback, "
-    disabled_fields = disabled_fields or []
+    field_plan = compile_field_plan(
+        field_name=field_name,
+        field=field,
+        field_name_root=field_name_root,
+        readonly=readonly,
+        disabled_fields=disabled_fields,
+        context=context,
+    )
+    if (profiler := current_profiler()) is not None:
+        return profiler.measure(field_plan.field_type.name, field_plan.field_name, bind_input, field_plan, model)
+    return bind_input(field_plan, model)
 
-    if not field.annotation:
-        ret = f"EMPTY field.annotation, {field.annotation = }, {field = }"
-        ret = ret.replace("<", "&lt;").replace(">", "&gt;")
-        ret = f"<pre> {ret} </pre>"
-        return DummyTag(ret)
 
-    field_last = field.alias or field_name
-    field_name = (field_name_root + "." if field_name_root else "") + field_last
-
-    value = field.default
+def bind_value(field_plan: FieldPlan, model: BaseModel | None) -> Any:
+    value = field_plan.field.default
     try:
-        value = getattr(model, field_last) if model else field.default
+        value = getattr(model, field_plan.field_last) if model else field_plan.field.default
     except AttributeError as ex:
         pass  # TODO: fix that.
 
-    origin = get_origin(field.annotation)
-    args = get_args(field.annotation)
-    is_optional = check_for_optional(field.annotation)
-    disabled = True if readonly or (field_name in disabled_fields) else None
-    extra_attrs = context.attributes if isinstance(context, Context) else {}
-    field_type = context.override if isinstance(context, Context) else FieldType.UNKNOWN
-
     # fix pydantic undefined value
     if value == PydanticUndefined:
         value = None
 
-    if is_optional:  # TODO: do something with optional
-        ret = f"OPTIONAL, {field.annotation = }, {field = }"
+    return value
+
+
+def bind_input(field_plan: FieldPlan, model: BaseModel | None) -> Tag:
+    value = bind_value(field_plan, model)
+    return make_input(field_plan, input_values(field_plan, value))
+
+
+def input_values(field_plan: FieldPlan, value: Any) -> dict[str, Any]:
+    # the only parts of an input that depend on the bound value
+    field = field_plan.field
+
+    if not field.annotation or field_plan.is_optional:
+        return {}
+
+    match field_plan.field_type:
+        case FieldType.NESTED_MODEL:
+            nested_plan = field_plan.nested_plan(type(value) if value else field.annotation)
+            return {"forms": [render_model_plan(nested_plan, value)]}
+
+        case FieldType.NUMBER:
+            return {"value": str(value or 0)}
+
+        case FieldType.BOOLEAN:
+            return {"checked": bool(value or False)}
+
+        case FieldType.STRING | FieldType.TEXTAREA:
+            return {"value": str(value or "")}
+
+        case FieldType.ENUM if (options := field_plan.enum_options) is not None:
+            return {"options": SelectedOptions(options, options.select(value))}
+
+        case FieldType.ENUM_LIST if (options := field_plan.enum_options) is not None:
+            return {"options": SelectedOptions(options, options.select_any(value) if value else ())}
+
+        case FieldType.LITERAL:
+            return {"value": str(value)}
+
+        case FieldType.NESTED_UNION:
+            return {
+                "forms": [
+                    render_model_plan(field_plan.nested_plan(type(value) if value else united_model), value)
+                    for united_model in field_plan.args
+                ],
+            }
+
+        case FieldType.HTML:
+            # shown as text unless the field's context trusts it; pydantic turns `Markup` values into plain str
+            if field_plan.trusted_html:
+                return {"preview": Markup(value or "")}
+            return {"preview": Markup(escape(value or "", quote=False))}
+
+    return {}
+
+
+def make_input(field_plan: FieldPlan, values: dict[str, Any]) -> Tag:
+    ret = "fallback, "
+    field = field_plan.field
+    field_name = field_plan.field_name
+
+    if not field.annotation:
+        ret = f"EMPTY field.annotation, {field.annotation = }, {field = }"
         ret = ret.replace("<", "&lt;").replace(">", "&gt;")
         ret = f"<pre> {ret} </pre>"
         return DummyTag(ret)
 
-    if field_type == FieldType.UNKNOWN:
-        field_type = FieldType.resolve_type(field)
+    args = field_plan.args
+    disabled = field_plan.disabled
+    extra_attrs = field_plan.extra_attrs
+
+    if field_plan.is_optional:  # TODO: do something with optional
+        ret = f"OPTIONAL, {field.annotation = }, {field = }"
+        ret = ret.replace("<", "&lt;").replace(">", "&gt;")
+        ret = f"<pre> {ret} </pre>"
+        return DummyTag(ret)
 
-    match field_type:
+    match field_plan.field_type:
         case FieldType.NESTED_MODEL:
             if not issubclass(field.annotation, BaseModel):
                 raise Exception("impossible")  # make typing happy
 
-            return generate_form_inner(
-                model_type=field.annotation,
-                model=value,
-                field_name_root=field_name,
-                readonly=readonly,
-                disabled_fields=disabled_fields,
-                contexts=context if isinstance(context, Contexts) else Contexts(),
-            )
-
+            return values["forms"][0]
         case FieldType.NUMBER:
             return InputTag(
                 type_="number",
                 name=field_name,
-                value=str(value or 0),
+                value=values["value"],
                 disabled=disabled,
                 extra_attrs=extra_attrs,
             )
@@ -264,7 +564,7 @@ def get_input(
                 class_="my-2 form-check-input",
                 type_="checkbox",
                 name=field_name,
-                checked=bool(value or False),
+                checked=values["checked"],
                 disabled=disabled,
                 extra_attrs=extra_attrs,
             )
@@ -275,7 +575,7 @@ def get_input(
                 type_="text",
                 name=field_name,
                 placeholder=field.description or field_name,
-                value=str(value or ""),
+                value=values["value"],
                 disabled=disabled,
                 extra_attrs=extra_attrs,
             )
@@ -296,39 +596,22 @@ def get_input(
             if not issubclass(field.annotation, Enum):
                 raise Exception("impossible")  # make typing happy
 
-            enum: Type[Enum] = field.annotation
-            members = enum._member_map_  # noqa: SLF001, W0212 # i know.
-
             return SelectTag(
                 name=field_name,
                 class_="form-select",
-                options=[
-                    OptionTag(
-                        value=str(enum_val),
-                        selected=enum_val == value,
-                    )
-                    for enum_val in members.values()
-                ],
+                options=values["options"],
                 disabled=disabled,
                 extra_attrs=extra_attrs,
             )
 
         case FieldType.ENUM_LIST:
-            if not issubclass((enum := args[0]), Enum):
+            if not issubclass(args[0], Enum):
                 raise Exception("impossible")  # make typing happy
 
-            members = enum._member_map_  # noqa: SLF001, W0212 # i know.
-
             return SelectTag(
                 name=field_name,
                 class_="form-select form-select-multiple",
-                options=[
-                    OptionTag(
-                        value=str(enum_val),
-                        selected=((enum_val in value) if value else False),
-                    )
-                    for enum_val in members.values()
-                ],
+                options=values["options"],
                 disabled=disabled,
                 multiple=True,
                 extra_attrs=extra_attrs,
@@ -340,7 +623,7 @@ def get_input(
                 type_="text",
                 name=field_name,
                 placeholder=field.description or field_name,
-                value=str(value),
+                value=values["value"],
                 disabled=True,
                 extra_attrs=extra_attrs,
             )
@@ -355,15 +638,9 @@ def get_input(
             raw_opts: list[OptionTag] = []
             raw_divs: list = []
 
-            for united_model in args:
+            for united_model, inner_form in zip(args, values["forms"]):
                 united_model: Type[BaseModel]
                 model_name = united_model.__name__
-                inner_form = generate_form_inner(
-                    model_type=united_model,
-                    model=value,
-                    field_name_root=field_name,
-                    contexts=context if isinstance(context, Contexts) else Contexts(),
-                )
                 raw_opts.append(
                     OptionTag(
                         value=model_name,
@@ -407,7 +684,7 @@ def get_input(
                 class_="form-control",
                 type_="text",
                 name=field_name,
-                value=str(value or ""),
+                value=values["value"],
                 disabled=disabled,
                 extra_attrs=extra_attrs,
             )
@@ -441,7 +718,7 @@ def get_input(
                         tags=[
                             DivTag(
                                 class_="card card-body",
-                                tags=[DummyTag(str(value or ""))],
+                                tags=[DummyTag(values["preview"])],
                             )
                         ],
                     )
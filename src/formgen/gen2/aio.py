@@ -0,0 +1,105 @@
+import asyncio
+import contextvars
+from collections.abc import AsyncIterator, Iterator
+from concurrent.futures import Executor, ProcessPoolExecutor
+from functools import partial
+from typing import Type
+
+from ..budget import current_budget
+from ..tags import Tag, Tags, coalesce
+from . import Contexts, ModelPlan, PydanticModel, compile_model_plan, make_form, render_model_plan
+from .template import iter_render_form
+
+# every `executor` below is passed to `loop.run_in_executor`, `None` is the loop's default thread pool.
+# jobs run in a copy of the caller's context, so render budgets, profiling and fragment caches set up around
+# the call apply to them like to the synchronous functions.
+# that is also why it has to run jobs in threads: a context can't be pickled to a process pool.
+
+
+def check_executor(executor: Executor | None) -> None:
+    if isinstance(executor, ProcessPoolExecutor):
+        raise TypeError("gen2.aio needs a thread pool, its jobs run in the caller's context which can't be pickled")
+
+
+async def generate_form_async(
+    model_type: Type[PydanticModel],
+    model: PydanticModel | None = None,
+    form_id: str = "",
+    form_class: str = "",
+    readonly: bool = False,
+    disabled_fields: list[str] | None = None,
+    contexts: Contexts | None = None,
+    executor: Executor | None = None,
+) -> Tag:
+    # same form as `generate_form`, built one top-level field per executor job
+    check_executor(executor)
+    loop = asyncio.get_running_loop()
+    # one copy for every job, they run one after another
+    context = contextvars.copy_context()
+    budget = context.run(current_budget)
+
+    plan = await loop.run_in_executor(
+        executor,
+        context.run,
+        partial(
+            compile_model_plan,
+            model_type=type(model) if model else model_type,
+            readonly=readonly,
+            disabled_fields=disabled_fields,
+            contexts=contexts,
+        ),
+    )
+
+    tags = []
+    for field_plan in plan.fields:
+        field_plan_only = ModelPlan(model_type=plan.model_type, fields=[field_plan])
+        tags.append(await loop.run_in_executor(executor, context.run, render_model_plan, field_plan_only, model))
+        if budget is not None and budget.exhausted():
+            # the job put a placeholder instead of the rest, as `generate_form` does
+            break
+
+    return make_form(Tags(tags), form_id=form_id, form_class=form_class)
+
+
+async def aiter_chunks(chunks: Iterator[str], executor: Executor | None = None) -> AsyncIterator[str]:
+    # pulls every chunk in the executor, so the event loop only ever waits on a future
+    check_executor(executor)
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    while (chunk := await loop.run_in_executor(executor, context.run, next, chunks, None)) is not None:
+        yield chunk
+
+
+def aiter_render(
+    tag: Tag,
+    executor: Executor | None = None,
+    chunk_size: int = 8192,
+    compact: bool = False,
+) -> AsyncIterator[str]:
+    return aiter_chunks(tag.iter_chunks(chunk_size, compact), executor)
+
+
+def aiter_render_form(
+    model_type: Type[PydanticModel],
+    model: PydanticModel | None = None,
+    form_id: str = "",
+    form_class: str = "",
+    readonly: bool = False,
+    disabled_fields: list[str] | None = None,
+    contexts: Contexts | None = None,
+    executor: Executor | None = None,
+    chunk_size: int = 8192,
+    compact: bool = False,
+) -> AsyncIterator[str]:
+    # async version of `template.iter_render_form`
+    chunks = iter_render_form(
+        model_type=model_type,
+        model=model,
+        form_id=form_id,
+        form_class=form_class,
+        readonly=readonly,
+        disabled_fields=disabled_fields,
+        contexts=contexts,
+        compact=compact,
+    )
+    return aiter_chunks(coalesce(chunks, chunk_size), executor)
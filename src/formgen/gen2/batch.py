@@ -0,0 +1,105 @@
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
+from typing import Type
+
+from . import Contexts, PydanticModel, compile_model_plan
+from .template import FormTemplate, form_shell, get_template
+
+
+def iter_forms(
+    model_type: Type[PydanticModel],
+    models: Iterable[PydanticModel | None],
+    form_id: str = "",
+    form_class: str = "",
+    readonly: bool = False,
+    disabled_fields: list[str] | None = None,
+    contexts: Contexts | None = None,
+    start: int = 0,
+    compact: bool = False,
+) -> Iterator[Iterator[str]]:
+    # one chunk iterator per model; `form_id` may contain "{index}", the position of the model in `models`
+    templates: dict[type, FormTemplate] = {}
+
+    for index, model in enumerate(models, start=start):
+        rendered_type = type(model) if model else model_type
+        if (template := templates.get(rendered_type)) is None:
+            plan = compile_model_plan(
+                model_type=rendered_type,
+                readonly=readonly,
+                disabled_fields=disabled_fields,
+                contexts=contexts,
+            )
+            template = templates[rendered_type] = get_template(plan, compact)
+
+        head, tail = form_shell(form_id.format(index=index) if "{" in form_id else form_id, form_class, compact)
+        yield chain((head,), template.iter_render(model), (tail,))
+
+
+def iter_render_forms(
+    model_type: Type[PydanticModel],
+    models: Iterable[PydanticModel | None],
+    form_id: str = "",
+    form_class: str = "",
+    readonly: bool = False,
+    disabled_fields: list[str] | None = None,
+    contexts: Contexts | None = None,
+    start: int = 0,
+    compact: bool = False,
+) -> Iterator[str]:
+    forms = iter_forms(
+        model_type=model_type,
+        models=models,
+        form_id=form_id,
+        form_class=form_class,
+        readonly=readonly,
+        disabled_fields=disabled_fields,
+        contexts=contexts,
+        start=start,
+        compact=compact,
+    )
+    for form in forms:
+        yield from form
+
+
+def _render_chunk(args: tuple) -> list[str]:
+    model_type, models, start, options = args
+    return render_forms(model_type, models, start=start, **options)
+
+
+def render_forms(
+    model_type: Type[PydanticModel],
+    models: Iterable[PydanticModel | None],
+    form_id: str = "",
+    form_class: str = "",
+    readonly: bool = False,
+    disabled_fields: list[str] | None = None,
+    contexts: Contexts | None = None,
+    start: int = 0,
+    processes: int | None = None,
+    chunk_size: int = 256,
+    compact: bool = False,
+) -> list[str]:
+    options = {
+        "form_id": form_id,
+        "form_class": form_class,
+        "readonly": readonly,
+        "disabled_fields": disabled_fields,
+        "contexts": contexts,
+        "compact": compact,
+    }
+
+    if not processes:
+        return ["".join(form) for form in iter_forms(model_type, models, start=start, **options)]  # type: ignore
+
+    # models (and `model_type`) have to be picklable; every worker compiles its own templates once.
+    # worker processes don't see the caller's context, so a render budget or profiler set up around the call
+    # covers only the `processes=None` path.
+    it = iter(models)
+    chunks = []
+    while chunk := list(islice(it, chunk_size)):
+        chunks.append((model_type, chunk, start, options))
+        start += len(chunk)
+
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        return [form for forms in executor.map(_render_chunk, chunks) for form in forms]
@@ -0,0 +1,86 @@
+import threading
+from collections.abc import Iterable, Iterator
+from typing import Type
+from weakref import WeakKeyDictionary
+
+from ..tags import DummyTag, TableTag, Tag, TdTag, ThTag, TrTag
+from . import Contexts, FieldPlan, ModelPlan, PydanticModel, compile_model_plan
+from .template import ROOT, FormTemplate, compile_template
+
+_row_templates: WeakKeyDictionary[ModelPlan, FormTemplate] = WeakKeyDictionary()
+_compact_row_templates: WeakKeyDictionary[ModelPlan, FormTemplate] = WeakKeyDictionary()
+_row_templates_lock = threading.Lock()
+
+
+def row_layout(inputs: list[tuple[FieldPlan, Tag]]) -> Tag:
+    return TrTag(tags=[TdTag(tags=[input_body]) for _, input_body in inputs])
+
+
+def get_row_template(plan: ModelPlan, compact: bool = False) -> FormTemplate:
+    templates = _compact_row_templates if compact else _row_templates
+    if (template := templates.get(plan)) is None:
+        template = compile_template(plan, layout=row_layout, compact=compact)
+        with _row_templates_lock:
+            template = templates.setdefault(plan, template)
+    return template
+
+
+def iter_render_table(
+    model_type: Type[PydanticModel],
+    models: Iterable[PydanticModel],
+    name_root: str = "rows",
+    table_id: str = "",
+    table_class: str = "table",
+    readonly: bool = False,
+    disabled_fields: list[str] | None = None,
+    contexts: Contexts | None = None,
+    compact: bool = False,
+) -> Iterator[str]:
+    # one row per model, one column per field; inputs of row N are named `{name_root}.{N}.{field}`.
+    # `disabled_fields` are relative to a row and disable the whole column.
+    plan = compile_model_plan(
+        model_type=model_type,
+        field_name_root=ROOT,
+        readonly=readonly,
+        disabled_fields=[f"{ROOT}.{field_name}" for field_name in disabled_fields or []],
+        contexts=contexts,
+    )
+    template = get_row_template(plan, compact)
+
+    header = TrTag(tags=[ThTag(tags=[DummyTag(field_plan.label)]) for field_plan in plan.fields])
+    table = TableTag(id=table_id, class_=table_class, tags=[header, DummyTag("\x00")])
+    # the separator goes before each row, so an empty table renders like the tree without rows
+    separator = "" if compact else "\n"
+    head, tail = table.render(compact).split(separator + "\x00")
+
+    yield head
+    for i, model in enumerate(models):
+        yield separator
+        yield from template.iter_render(model, root=f"{name_root}.{i}")
+    yield tail
+
+
+def render_table(
+    model_type: Type[PydanticModel],
+    models: Iterable[PydanticModel],
+    name_root: str = "rows",
+    table_id: str = "",
+    table_class: str = "table",
+    readonly: bool = False,
+    disabled_fields: list[str] | None = None,
+    contexts: Contexts | None = None,
+    compact: bool = False,
+) -> str:
+    return "".join(
+        iter_render_table(
+            model_type=model_type,
+            models=models,
+            name_root=name_root,
+            table_id=table_id,
+            table_class=table_class,
+            readonly=readonly,
+            disabled_fields=disabled_fields,
+            contexts=contexts,
+            compact=compact,
+        ),
+    )
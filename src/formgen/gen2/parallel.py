@@ -0,0 +1,65 @@
+import os
+import sys
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Type
+
+from ..tags import DummyTag, Tag
+from . import Contexts, PydanticModel, bind_input, compile_model_plan, generate_form, make_form, wrap_input
+
+# forms with fewer top-level fields are rendered in the calling thread, a pool round trip costs more than they do
+PARALLEL_MIN_FIELDS = 64
+
+
+def free_threaded() -> bool:
+    return hasattr(sys, "_is_gil_enabled") and not sys._is_gil_enabled()  # noqa: SLF001
+
+
+def _render_fields(args: tuple) -> str:
+    model_type, model, start, stop, options, compact = args
+    plan = compile_model_plan(model_type=model_type, **options)
+    fields = plan.fields[start:stop]
+    rendered = (wrap_input(field_plan, bind_input(field_plan, model)).render(compact) for field_plan in fields)
+    return ("" if compact else "\n").join(rendered)
+
+
+def generate_form_parallel(
+    model_type: Type[PydanticModel],
+    model: PydanticModel | None = None,
+    form_id: str = "",
+    form_class: str = "",
+    readonly: bool = False,
+    disabled_fields: list[str] | None = None,
+    contexts: Contexts | None = None,
+    workers: int | None = None,
+    chunk_size: int | None = None,
+    min_fields: int = PARALLEL_MIN_FIELDS,
+    executor: Executor | None = None,
+    compact: bool = False,
+) -> Tag:
+    # same markup as `generate_form`, top-level fields are rendered in chunks by a pool and joined in field order.
+    # the pool is a process pool (`model` has to be picklable) or a thread pool on free-threaded builds;
+    # pass `executor` to reuse one between calls instead of starting a new pool every time.
+    # fields are serialized in the workers, so `compact` has to match how the returned form is rendered.
+    # workers don't see the caller's context: render budgets, profiling and fragment caches are not applied there.
+    rendered_type = type(model) if model else model_type
+    options = {"readonly": readonly, "disabled_fields": disabled_fields, "contexts": contexts}
+
+    fields_count = len(rendered_type.model_fields)
+    if fields_count < min_fields:
+        return generate_form(model_type, model, form_id=form_id, form_class=form_class, **options)  # type: ignore
+
+    workers = workers or os.cpu_count() or 1
+    chunk_size = chunk_size or -(-fields_count // (workers * 2))
+    chunks = [
+        (rendered_type, model, start, min(start + chunk_size, fields_count), options, compact)
+        for start in range(0, fields_count, chunk_size)
+    ]
+
+    if executor is not None:
+        fragments = list(executor.map(_render_fields, chunks))
+    else:
+        pool_type = ThreadPoolExecutor if free_threaded() else ProcessPoolExecutor
+        with pool_type(max_workers=workers) as pool:
+            fragments = list(pool.map(_render_fields, chunks))
+
+    return make_form(DummyTag(("" if compact else "\n").join(fragments)), form_id=form_id, form_class=form_class)
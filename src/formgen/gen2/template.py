@@ -0,0 +1,257 @@
+import re
+import threading
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Type
+from weakref import WeakKeyDictionary
+
+from pydantic import BaseModel
+
+from ..budget import BudgetState, current_budget
+from ..tags import DummyTag, Tag, Tags, escape, format_attr
+from . import (
+    Contexts,
+    FieldPlan,
+    FieldType,
+    ModelPlan,
+    PydanticModel,
+    bind_value,
+    compile_model_plan,
+    input_values,
+    make_form,
+    make_input,
+    wrap_input,
+)
+
+# slots are rendered as `\x00{n}\x00`, either as a whole attribute value (unquoted in compact markup) or as text content
+_SLOT_RE = re.compile('( ([^\\s="]+)="?\x00(\\d+)\x00"?)|\x00(\\d+)\x00')
+
+# stands for a field name root that is only known at render time (e.g. a row of a grid)
+ROOT = "\x01"
+
+Layout = Callable[[list[tuple[FieldPlan, Tag]]], Tag]
+
+
+@dataclass
+class Hole:
+    field: int  # index of the field plan
+    key: str  # key in `input_values`
+    index: int | None = None  # position in list-like values (union variants)
+    attr: str | None = None  # html attribute name, `None` for text content or a whole tag
+
+
+@dataclass
+class SubformHole(Hole):
+    pass
+
+
+@dataclass
+class RootHole:
+    id: bool  # noqa: A003 # inside a div id, where dots of the root are replaced by "__"
+
+
+@dataclass(eq=False)
+class FormTemplate:
+    plan: ModelPlan
+    parts: list[str | Hole | RootHole]
+    bound_fields: list[int]  # fields with at least one hole
+    value_fields: set[int]  # fields with attribute / text holes
+    compact: bool = False
+
+    def iter_render(self, model: BaseModel | None = None, root: str = "") -> Iterator[str]:
+        budget = current_budget()
+        chunks = self.iter_parts(model, root, budget)
+        # nested templates stream into this one, so the bytes of the whole output are counted once, here
+        return chunks if budget is None else budget.limit(chunks)
+
+    def iter_parts(self, model: BaseModel | None, root: str, budget: BudgetState | None) -> Iterator[str]:
+        fields = self.plan.fields
+        if budget is not None and (placeholder := self.spend(budget)):
+            yield placeholder.render(self.compact)
+            return
+
+        values: dict[int, Any] = {}
+        dynamic: dict[int, dict[str, Any]] = {}
+
+        for i in self.bound_fields:
+            values[i] = bind_value(fields[i], model)
+            if i in self.value_fields:
+                dynamic[i] = input_values(fields[i], values[i])
+
+        for part in self.parts:
+            if isinstance(part, str):
+                yield part
+            elif isinstance(part, RootHole):
+                yield root.replace(".", "__") if part.id else root
+            elif isinstance(part, SubformHole):
+                field_plan = fields[part.field]
+                value = values[part.field]
+                if value:
+                    nested_type = type(value)
+                elif field_plan.field_type == FieldType.NESTED_UNION:
+                    nested_type = field_plan.args[part.index or 0]
+                else:
+                    nested_type = field_plan.field.annotation
+                nested = get_template(field_plan.nested_plan(nested_type), self.compact).iter_parts(value, root, budget)
+                yield from nested if budget is None else budget.iter_nested(field_plan.field_name, nested)
+            else:
+                value = dynamic[part.field][part.key]
+                if part.index is not None:
+                    value = value[part.index]
+                if isinstance(value, Tag):
+                    yield from value.iter_render(self.compact)
+                elif part.attr is None:
+                    yield escape(value, quote=False)
+                elif attr := format_attr(part.attr, value, self.compact):
+                    yield " " + attr
+
+    def spend(self, budget: BudgetState) -> Tag | None:
+        # the static parts mix the markup of every field, so a model is paid for before any of it is streamed
+        # and a placeholder stands for all of its fields; counted like `render_plan_fields` does
+        for field_plan in self.plan.fields:
+            options = len(field_plan.enum_options.values) if field_plan.enum_options else 0
+            if placeholder := budget.spend(5 + options, field_plan.field_name):
+                return placeholder
+        return None
+
+    def render(self, model: BaseModel | None = None, root: str = "") -> str:
+        return "".join(self.iter_render(model, root))
+
+
+_templates: WeakKeyDictionary[ModelPlan, FormTemplate] = WeakKeyDictionary()
+_compact_templates: WeakKeyDictionary[ModelPlan, FormTemplate] = WeakKeyDictionary()
+_templates_lock = threading.Lock()
+
+
+def default_layout(inputs: list[tuple[FieldPlan, Tag]]) -> Tag:
+    return Tags([wrap_input(field_plan, input_body) for field_plan, input_body in inputs])
+
+
+def compile_template(plan: ModelPlan, layout: Layout = default_layout, compact: bool = False) -> FormTemplate:
+    holes: list[Hole] = []
+
+    def slot(hole: Hole) -> str:
+        holes.append(hole)
+        return f"\x00{len(holes) - 1}\x00"
+
+    inputs: list[tuple[FieldPlan, Tag]] = []
+    for i, field_plan in enumerate(plan.fields):
+        values: dict[str, Any] = {}
+        if not field_plan.field.annotation or field_plan.is_optional:
+            pass
+        elif field_plan.field_type in (FieldType.NESTED_MODEL, FieldType.NESTED_UNION):
+            variants = len(field_plan.args) if field_plan.field_type == FieldType.NESTED_UNION else 1
+            values["forms"] = [DummyTag(slot(SubformHole(i, "forms", k))) for k in range(variants)]
+        else:
+            for key, value in input_values(field_plan, None).items():
+                if isinstance(value, list):
+                    values[key] = [slot(Hole(i, key, k)) for k in range(len(value))]
+                elif isinstance(value, Tag):
+                    # e.g. enum options, rendered whole from the bound value
+                    values[key] = DummyTag(slot(Hole(i, key)))
+                else:
+                    values[key] = slot(Hole(i, key))
+
+        inputs.append((field_plan, make_input(field_plan, values)))
+
+    parts: list[str | Hole | RootHole] = []
+    used: list[Hole] = []
+    source = layout(inputs).render(compact)
+    pos = 0
+    for match in _SLOT_RE.finditer(source):
+        parts.extend(split_root(source[pos : match.start()]))
+        pos = match.end()
+
+        if match.group(1):
+            hole = holes[int(match.group(3))]
+            hole.attr = match.group(2)
+        else:
+            hole = holes[int(match.group(4))]
+
+        parts.append(hole)
+        used.append(hole)
+    parts.extend(split_root(source[pos:]))
+
+    return FormTemplate(
+        plan=plan,
+        parts=[part for part in parts if part != ""],
+        bound_fields=sorted({hole.field for hole in used}),
+        value_fields={hole.field for hole in used if not isinstance(hole, SubformHole)},
+        compact=compact,
+    )
+
+
+def split_root(static: str) -> list[str | RootHole]:
+    if ROOT not in static:
+        return [static]
+
+    parts: list[str | RootHole] = []
+    for i, chunk in enumerate(static.split(ROOT)):
+        if i:
+            # div ids are built as `("div_" + name).replace(".", "__")`, so the root is followed by "__" there
+            parts.append(RootHole(id=chunk.startswith("__")))
+        parts.append(chunk)
+    return parts
+
+
+def get_template(plan: ModelPlan, compact: bool = False) -> FormTemplate:
+    templates = _compact_templates if compact else _templates
+    if (template := templates.get(plan)) is None:
+        template = compile_template(plan, compact=compact)
+        with _templates_lock:
+            template = templates.setdefault(plan, template)
+    return template
+
+
+@lru_cache(maxsize=256)
+def form_shell(form_id: str = "", form_class: str = "", compact: bool = False) -> tuple[str, str]:
+    head, tail = make_form(DummyTag("\x00"), form_id=form_id, form_class=form_class).render(compact).split("\x00")
+    return head, tail
+
+
+def iter_render_form(
+    model_type: Type[PydanticModel],
+    model: PydanticModel | None = None,
+    form_id: str = "",
+    form_class: str = "",
+    readonly: bool = False,
+    disabled_fields: list[str] | None = None,
+    contexts: Contexts | None = None,
+    compact: bool = False,
+) -> Iterator[str]:
+    plan = compile_model_plan(
+        model_type=type(model) if model else model_type,
+        readonly=readonly,
+        disabled_fields=disabled_fields,
+        contexts=contexts,
+    )
+    head, tail = form_shell(form_id, form_class, compact)
+
+    yield head
+    yield from get_template(plan, compact).iter_render(model)
+    yield tail
+
+
+def render_form(
+    model_type: Type[PydanticModel],
+    model: PydanticModel | None = None,
+    form_id: str = "",
+    form_class: str = "",
+    readonly: bool = False,
+    disabled_fields: list[str] | None = None,
+    contexts: Contexts | None = None,
+    compact: bool = False,
+) -> str:
+    return "".join(
+        iter_render_form(
+            model_type=model_type,
+            model=model,
+            form_id=form_id,
+            form_class=form_class,
+            readonly=readonly,
+            disabled_fields=disabled_fields,
+            contexts=contexts,
+            compact=compact,
+        ),
+    )
@@ -0,0 +1,139 @@
+import time
+from bisect import bisect_left
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any
+
+from .tags import SelectTag, Tag, Tags
+
+# upper bounds of histogram buckets, ns; the last bucket is everything above
+BUCKETS_NS: tuple[int, ...] = (1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+
+_current: ContextVar["Profiler | None"] = ContextVar("formgen_profiler", default=None)
+
+
+def current_profiler() -> "Profiler | None":
+    return _current.get()
+
+
+@contextmanager
+def profiling(profiler: "Profiler | None" = None) -> Iterator["Profiler"]:
+    # forms generated inside the block (in this context) report to `profiler`
+    profiler = profiler or Profiler()
+    token = _current.set(profiler)
+    try:
+        yield profiler
+    finally:
+        _current.reset(token)
+
+
+def count_nodes(tag: Tag) -> int:
+    count = 0
+    stack = [tag]
+    while stack:
+        node = stack.pop()
+        count += 1
+        if isinstance(node, Tags):
+            stack.extend(node.tags)
+        elif isinstance(node, SelectTag):
+            # options have no children; iterating `SelectedOptions` would build a tag per option
+            count += len(node.options)
+    return count
+
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+@dataclass
+class Histogram:
+    bounds: tuple[int, ...] = BUCKETS_NS
+    counts: list[int] = field(default_factory=list)
+    sum: int = 0  # noqa: A003
+
+    def __post_init__(self) -> None:
+        self.counts = self.counts or [0] * (len(self.bounds) + 1)
+
+    def observe(self, value: int) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+@dataclass
+class Stats:
+    calls: int = 0
+    elapsed_ns: int = 0
+    nodes: int = 0
+    histogram: Histogram = field(default_factory=Histogram)
+
+    def add(self, elapsed_ns: int, nodes: int) -> None:
+        self.calls += 1
+        self.elapsed_ns += elapsed_ns
+        self.nodes += nodes
+        self.histogram.observe(elapsed_ns)
+
+
+@dataclass
+class Profiler:
+    # field times include nested fields, e.g. a NESTED_MODEL field covers every field of its submodel
+    by_type: dict[str, Stats] = field(default_factory=dict)
+    by_path: dict[str, Stats] = field(default_factory=dict)
+    serialization: Stats = field(default_factory=Stats)
+    output_bytes: int = 0
+
+    def measure(self, field_type: str, path: str, build: Callable[..., Tag], *args: Any) -> Tag:
+        started = time.perf_counter_ns()
+        tag = build(*args)
+        elapsed_ns = time.perf_counter_ns() - started
+
+        nodes = count_nodes(tag)
+        self.by_type.setdefault(field_type, Stats()).add(elapsed_ns, nodes)
+        self.by_path.setdefault(path, Stats()).add(elapsed_ns, nodes)
+        return tag
+
+    def serialize(self, tag: Tag, compact: bool = False) -> str:
+        started = time.perf_counter_ns()
+        html = tag.render(compact)
+        elapsed_ns = time.perf_counter_ns() - started
+
+        self.serialization.add(elapsed_ns, count_nodes(tag))
+        self.output_bytes += len(html.encode())
+        return html
+
+    def counters(self) -> list[tuple[str, dict[str, str], int]]:
+        # (name, labels, value)
+        ret: list[tuple[str, dict[str, str], int]] = []
+        for label, stats in (("type", self.by_type), ("path", self.by_path)):
+            for key, stat in stats.items():
+                ret.append(("formgen_field_calls_total", {label: key}, stat.calls))
+                ret.append(("formgen_field_ns_total", {label: key}, stat.elapsed_ns))
+                ret.append(("formgen_field_nodes_total", {label: key}, stat.nodes))
+        ret.append(("formgen_serialize_calls_total", {}, self.serialization.calls))
+        ret.append(("formgen_serialize_ns_total", {}, self.serialization.elapsed_ns))
+        ret.append(("formgen_output_bytes_total", {}, self.output_bytes))
+        return ret
+
+    def histograms(self) -> list[tuple[str, dict[str, str], Histogram]]:
+        ret = [("formgen_field_ns", {"type": key}, stat.histogram) for key, stat in self.by_type.items()]
+        ret.append(("formgen_serialize_ns", {}, self.serialization.histogram))
+        return ret
+
+    def to_prometheus(self) -> str:
+        # text exposition format
+        def labels(values: dict[str, str]) -> str:
+            escaped = (f'{k}="{escape_label(v)}"' for k, v in values.items())
+            return "{" + ",".join(escaped) + "}" if values else ""
+
+        lines = []
+        for name, label_values, value in self.counters():
+            lines.append(f"{name}{labels(label_values)} {value}")
+        for name, label_values, histogram in self.histograms():
+            cumulative = 0
+            for bound, count in zip((*map(str, histogram.bounds), "+Inf"), histogram.counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{labels(label_values | {'le': bound})} {cumulative}")
+            lines.append(f"{name}_sum{labels(label_values)} {histogram.sum}")
+            lines.append(f"{name}_count{labels(label_values)} {cumulative}")
+        return "\n".join(lines) + "\n"
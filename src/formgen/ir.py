@@ -0,0 +1,314 @@
+from array import array
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from enum import IntEnum
+
+from .fragments import Fragment
+from .tags import (
+    ButtonTag,
+    DivTag,
+    DummyTag,
+    FieldsetTag,
+    FormTag,
+    HTMLTag,
+    InputTag,
+    LabelTag,
+    Markup,
+    OptionTag,
+    PTag,
+    SelectTag,
+    TableTag,
+    Tag,
+    Tags,
+    TdTag,
+    TextareaTag,
+    ThTag,
+    TrTag,
+    escape,
+    write_attr,
+)
+
+
+# text and attribute values are stored escaped, so rendering never escapes anything
+class Op(IntEnum):
+    OPEN = 0  # `<name `, a = name
+    ATTR = 1  # `name="value"`, a = name, b = value
+    FLAG = 2  # `name`, a = name
+    START = 3  # `>`
+    TEXT = 4  # raw text, a = text
+    SEP = 5  # "\n" between children and around container content
+    CLOSE = 6  # `</name>`, a = name
+    RAW = 7  # markup rendered ahead of time, a = as is, b = compact
+
+
+# every instruction is (op, a, b); a and b index the string table
+WIDTH = 3
+
+CONTAINERS: dict[type[HTMLTag], str] = {
+    PTag: "p",
+    TableTag: "table",
+    TrTag: "tr",
+    ThTag: "th",
+    TdTag: "td",
+    DivTag: "div",
+    FormTag: "form",
+    FieldsetTag: "fieldset",
+}
+
+# content of these elements is the tag field named here
+TEXT_ELEMENTS: dict[type[HTMLTag], tuple[str, str]] = {
+    TextareaTag: ("textarea", "value"),
+    ButtonTag: ("button", "value"),
+    OptionTag: ("option", "value"),
+    LabelTag: ("label", "label"),
+}
+
+ELEMENTS: dict[str, type[HTMLTag]] = (
+    {name: cls for cls, name in CONTAINERS.items()}
+    | {name: cls for cls, (name, _) in TEXT_ELEMENTS.items()}
+    | {"input": InputTag, "select": SelectTag}
+)
+
+
+@dataclass(slots=True)
+class FormIR:
+    strings: list[str] = field(default_factory=list)
+    # unsigned shorts until the string table outgrows them
+    code: array = field(default_factory=lambda: array("H"))
+
+    _index: dict[str, int] = field(default_factory=dict, repr=False, compare=False)
+
+    def __getstate__(self) -> tuple[list[str], array]:
+        return self.strings, self.code
+
+    def __setstate__(self, state: tuple[list[str], array]) -> None:
+        self.strings, self.code = state
+        self._index = {}
+
+    def __len__(self) -> int:
+        return len(self.code) // WIDTH
+
+    def string(self, value: str) -> int:
+        if not self._index and self.strings:
+            self._index = {s: i for i, s in enumerate(self.strings)}
+        if (i := self._index.get(value)) is None:
+            i = self._index[value] = len(self.strings)
+            self.strings.append(value)
+            if i == 0xFFFF and self.code.typecode == "H":
+                self.code = array("I", self.code)
+        return i
+
+    def emit(self, op: Op, a: str | None = None, b: str | None = None) -> None:
+        # `string` may swap `code` for a wider array, so it's looked up only after both indexes are in
+        a_index = 0 if a is None else self.string(a)
+        b_index = 0 if b is None else self.string(b)
+        self.code.extend((op, a_index, b_index))
+
+    def slice(self, start: int, stop: int) -> "FormIR":
+        # instructions [start, stop), sharing the string table
+        return FormIR(strings=self.strings, code=self.code[start * WIDTH : stop * WIDTH])
+
+    def iter_render(self, compact: bool = False) -> Iterator[str]:
+        # plain ints are noticeably faster to compare than IntEnum members in this loop
+        ops = (Op.TEXT, Op.SEP, Op.OPEN, Op.ATTR, Op.FLAG, Op.START, Op.CLOSE, Op.RAW)
+        text, sep, open_, attr, flag, start, close, raw = map(int, ops)
+        raw_form = 2 if compact else 1
+        if compact:
+            # separators are dropped, the "-1" op never occurs
+            sep = -1
+
+        strings = self.strings
+        code = self.code
+        first = False
+
+        for i in range(0, len(code), WIDTH):
+            op = code[i]
+            if op == text:
+                yield strings[code[i + 1]]
+            elif op == sep:
+                yield "\n"
+            elif op == open_:
+                yield f"<{strings[code[i + 1]]}" if compact else f"<{strings[code[i + 1]]} "
+                first = not compact
+            elif op == attr:
+                if compact:
+                    yield " " + write_attr(strings[code[i + 1]], strings[code[i + 2]], compact=True)
+                else:
+                    yield f'{"" if first else " "}{strings[code[i + 1]]}="{strings[code[i + 2]]}"'
+                first = False
+            elif op == flag:
+                yield f'{"" if first else " "}{strings[code[i + 1]]}'
+                first = False
+            elif op == start:
+                yield ">"
+            elif op == close:
+                yield f"</{strings[code[i + 1]]}>"
+            elif op == raw:
+                yield strings[code[i + raw_form]]
+
+    def render(self, compact: bool = False) -> str:
+        return "".join(self.iter_render(compact))
+
+    def __str__(self) -> str:
+        return self.render()
+
+
+def element_of(tag: Tag) -> type[HTMLTag] | None:
+    for cls in type(tag).__mro__:
+        if cls in CONTAINERS or cls in TEXT_ELEMENTS or cls in (InputTag, SelectTag):
+            return cls
+    return None
+
+
+def emit_attrs(ir: FormIR, tag: HTMLTag) -> None:
+    for attr_name, attr_value in tag.raw_attrs.items():
+        if attr_value is None:
+            continue
+
+        if not isinstance(attr_value, bool) and not attr_value:
+            continue
+
+        match attr_value:
+            case list() | tuple():
+                ir.emit(Op.ATTR, attr_name, " ".join(map(escape, attr_value)))
+            case bool():
+                if attr_value:
+                    ir.emit(Op.FLAG, attr_name)
+            case _:
+                ir.emit(Op.ATTR, attr_name, escape(attr_value))
+
+
+def emit_children(ir: FormIR, tags: list[Tag]) -> None:
+    for i, inner in enumerate(tags):
+        if i:
+            ir.emit(Op.SEP)
+        emit(ir, inner)
+
+
+def emit(ir: FormIR, tag: Tag) -> None:
+    element = element_of(tag)
+
+    match tag:
+        case Fragment():
+            ir.emit(Op.RAW, tag.raw, tag.compact_raw)
+
+        case DummyTag():
+            ir.emit(Op.TEXT, tag.raw)
+
+        case HTMLTag() if element in CONTAINERS and isinstance(tag, Tags):
+            name = CONTAINERS[element]
+            ir.emit(Op.OPEN, name)
+            emit_attrs(ir, tag)
+            ir.emit(Op.START)
+            ir.emit(Op.SEP)
+            emit_children(ir, tag.tags)
+            ir.emit(Op.SEP)
+            ir.emit(Op.CLOSE, name)
+
+        case HTMLTag() if element in TEXT_ELEMENTS:
+            name, content = TEXT_ELEMENTS[element]
+            ir.emit(Op.OPEN, name)
+            emit_attrs(ir, tag)
+            ir.emit(Op.START)
+            if text := escape(getattr(tag, content), quote=False):
+                ir.emit(Op.TEXT, text)
+            ir.emit(Op.CLOSE, name)
+
+        case InputTag():
+            ir.emit(Op.OPEN, "input")
+            emit_attrs(ir, tag)
+            ir.emit(Op.START)
+
+        case SelectTag():
+            ir.emit(Op.OPEN, "select")
+            emit_attrs(ir, tag)
+            ir.emit(Op.START)
+            emit_children(ir, tag.options)
+            ir.emit(Op.CLOSE, "select")
+
+        case Tags():
+            emit_children(ir, tag.tags)
+
+        case Tag() if type(tag).iter_render is not Tag.iter_render:
+            # unknown tag with its own rendering, keep its markup as is
+            ir.emit(Op.RAW, str(tag), tag.render(compact=True))
+
+
+def to_ir(tag: Tag) -> FormIR:
+    ir = FormIR()
+    emit(ir, tag)
+    return ir
+
+
+@dataclass
+class _Open:
+    cls: type[HTMLTag]
+    attrs: dict[str, str | bool]
+    children: list[Tag] = field(default_factory=list)
+    text: str = ""
+
+
+def make_tag(node: _Open) -> Tag:
+    cls = node.cls
+    fields_by_attr = {ni: i for i, ni in cls().attr_fields}
+
+    kwargs: dict[str, object] = {}
+    extra_attrs: dict[str, str | bool | None] = {}
+    for attr_name, attr_value in node.attrs.items():
+        match fields_by_attr.get(attr_name):
+            case None:
+                extra_attrs[attr_name] = attr_value
+            case "style":
+                kwargs["style"] = [Markup(item) for item in str(attr_value).split(" ")]
+            case field_name:
+                kwargs[field_name] = attr_value
+
+    if extra_attrs:
+        kwargs["extra_attrs"] = extra_attrs
+
+    if cls in CONTAINERS:
+        kwargs["tags"] = node.children
+    elif cls is SelectTag:
+        kwargs["options"] = node.children
+    elif cls in TEXT_ELEMENTS:
+        kwargs[TEXT_ELEMENTS[cls][1]] = node.text
+
+    return cls(**kwargs)
+
+
+def from_ir(ir: FormIR) -> Tag:
+    strings = ir.strings
+    code = ir.code
+
+    top: list[Tag] = []
+    stack: list[_Open] = []
+
+    for i in range(0, len(code), WIDTH):
+        op, a, b = code[i], code[i + 1], code[i + 2]
+        children = stack[-1].children if stack else top
+
+        match op:
+            case Op.OPEN:
+                stack.append(_Open(cls=ELEMENTS[strings[a]], attrs={}))
+            case Op.ATTR:
+                # already escaped
+                stack[-1].attrs[strings[a]] = Markup(strings[b])
+            case Op.FLAG:
+                stack[-1].attrs[strings[a]] = True
+            case Op.START:
+                # input is a void element, there is no CLOSE for it
+                if stack[-1].cls is InputTag:
+                    tag = make_tag(stack.pop())
+                    (stack[-1].children if stack else top).append(tag)
+            case Op.TEXT:
+                if stack and stack[-1].cls in TEXT_ELEMENTS:
+                    stack[-1].text = Markup(stack[-1].text + strings[a])
+                else:
+                    children.append(DummyTag(strings[a]))
+            case Op.CLOSE:
+                tag = make_tag(stack.pop())
+                (stack[-1].children if stack else top).append(tag)
+            case Op.RAW:
+                children.append(Fragment(strings[a], strings[b]))
+
+    return top[0] if len(top) == 1 else Tags(top)
@@ -1,39 +1,178 @@
-from dataclasses import dataclass, field, asdict
-
-
+import sys
+from collections.abc import Callable, Hashable, Iterable, Iterator, Sequence
+from dataclasses import dataclass, field, fields
+from enum import Enum
+from operator import attrgetter
+from types import MemberDescriptorType
+from typing import Any
+
+
+class LazyEmpty:
+    # a slot whose empty default is only allocated when it's read (e.g. to be appended to); `None` is stored until then.
+    # `slot.__get__` reads the stored value as is, which is how serialization skips empty ones without allocating
+    __slots__ = ("factory", "slot")
+
+    def __init__(self, slot: MemberDescriptorType, factory: Callable[[], object]) -> None:
+        self.slot = slot
+        self.factory = factory
+
+    def __get__(self, tag: object, owner: type | None = None) -> Any:
+        if tag is None:
+            return self
+        if (value := self.slot.__get__(tag, owner)) is None:
+            value = self.factory()
+            self.slot.__set__(tag, value)
+        return value
+
+    def __set__(self, tag: object, value: object) -> None:
+        self.slot.__set__(tag, value)
+
+
+def field_reader(cls: type, name: str) -> Callable[[Any], Any]:
+    # reads a field of `cls` instances without allocating a `LazyEmpty` default
+    if isinstance(descriptor := getattr(cls, name, None), LazyEmpty):
+        return descriptor.slot.__get__
+    return attrgetter(name)
+
+
+def coalesce(chunks: Iterable[str], chunk_size: int = 8192) -> Iterator[str]:
+    buffer: list[str] = []
+    buffered = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        buffered += len(chunk)
+        if buffered >= chunk_size:
+            yield "".join(buffer)
+            buffer.clear()
+            buffered = 0
+    if buffer:
+        yield "".join(buffer)
+
+
+# NB: slotted dataclasses are re-created by the decorator, so zero-argument super() can't be used in them
 @dataclass
 class Tag:
+    __slots__ = ()
+
+    def iter_render(self, compact: bool = False) -> Iterator[str]:
+        # yields html chunks in document order; nothing is joined above the leaves.
+        # `compact` drops the newlines between elements and writes attributes as tight as html allows
+        yield from ()
+
     def __str__(self) -> str:
-        return ""
+        return "".join(self.iter_render())
 
+    def render(self, compact: bool = False) -> str:
+        return "".join(self.iter_render(compact))
 
-@dataclass
+    def iter_chunks(self, chunk_size: int = 8192, compact: bool = False) -> Iterator[str]:
+        # same output as `iter_render`, coalesced into chunks of about `chunk_size` chars for sending
+        return coalesce(self.iter_render(compact), chunk_size)
+
+
+@dataclass(slots=True)
 class Tags(Tag):
     tags: list[Tag] = field(default_factory=list)
 
-    def __str__(self) -> str:
-        return "\n".join(map(str, self.tags))
+    def iter_render(self, compact: bool = False) -> Iterator[str]:
+        for i, tag in enumerate(self.tags):
+            if i and not compact:
+                yield "\n"
+            yield from tag.iter_render(compact)
 
 
-@dataclass
+@dataclass(slots=True)
 class DummyTag(Tag):
     raw: str
 
-    def __str__(self) -> str:
-        return self.raw
+    def iter_render(self, compact: bool = False) -> Iterator[str]:
+        # raw markup is trusted and opaque, it is never escaped or minified
+        yield self.raw
+
+
+class Markup(str):
+    # trusted html, written as is and never escaped (again)
+    __slots__ = ()
+
+    def __html__(self) -> "Markup":
+        return self
+
+
+_TEXT_ESCAPES = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;"})
+_ATTR_ESCAPES = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&#x27;"})
+_TEXT_SPECIAL = frozenset("&<>")
+_ATTR_SPECIAL = frozenset("&<>\"'")
+
+# attribute values with none of these may be written without quotes (once escaped)
+_QUOTED_CHARS = frozenset(" \t\n\f\r\"'=<>`")
+
+
+def escape(value: object, quote: bool = True) -> str:
+    # `quote` for attribute values, text content only needs `&<>`
+    if isinstance(value, Markup):
+        return value
+    text = str(value)
+    # most values (names, numbers, class lists) have nothing to escape, scanning is much cheaper than translating
+    if (_ATTR_SPECIAL if quote else _TEXT_SPECIAL).isdisjoint(text):
+        return text
+    return text.translate(_ATTR_ESCAPES if quote else _TEXT_ESCAPES)
+
 
+def write_attr(attr_name: str, escaped_value: str, compact: bool = False) -> str:
+    # an empty unquoted value would take the next attribute as its value
+    if compact and escaped_value and _QUOTED_CHARS.isdisjoint(escaped_value):
+        return f"{attr_name}={escaped_value}"
+    return f'{attr_name}="{escaped_value}"'
 
+
+def format_attr(attr_name: str, attr_value: object, compact: bool = False) -> str:
+    # a single html attribute, or "" when it should be omitted
+    if attr_value is None:
+        return ""
+
+    if not isinstance(attr_value, bool) and not attr_value:
+        return ""
+
+    match attr_value:
+        case list() | tuple():
+            return write_attr(attr_name, " ".join(map(escape, attr_value)), compact)
+        case bool():
+            return f"{attr_name}" if attr_value else ""
+    return write_attr(attr_name, escape(attr_value), compact)
+
+
+_attr_fields_cache: dict[type, tuple[tuple[str, str], ...]] = {}
+# class -> (reader and html attribute name of every field, reader of `extra_attrs`)
+_attr_readers_cache: dict[type, tuple[tuple[tuple[Callable[[Any], Any], str], ...], Callable[[Any], Any]]] = {}
+
+
+# no storage here: concrete tags are slotted dataclasses with slots for all of their fields, so containers can
+# inherit both `HTMLTag` and `Tags` (only one base of a class may have slots)
 @dataclass
 class HTMLTag(Tag):
+    __slots__ = ()
+
     id: str = ""  # noqa: A003 # it's ok
     class_: str = ""
     title: str = ""
 
     hidden: bool | None = None
 
-    style: list[str] = field(default_factory=list)
+    # empty on almost every tag, allocated on first read (see `LazyEmpty`)
+    style: list[str] = None  # type: ignore[assignment]
 
-    extra_attrs: dict[str, str | None] = field(default_factory=dict)
+    extra_attrs: dict[str, str | None] = None  # type: ignore[assignment]
+
+    def __init_subclass__(cls) -> None:
+        # runs again for the class a slotted dataclass decorator re-creates, which has the slots
+        for name, factory in (("style", list), ("extra_attrs", dict)):
+            if isinstance(slot := cls.__dict__.get(name), MemberDescriptorType):
+                setattr(cls, name, LazyEmpty(slot, factory))
+
+    def __post_init__(self) -> None:
+        # the same few class strings ("form-control", "form-group row", ...) repeat across the whole tree
+        if type(self.class_) is str:
+            self.class_ = sys.intern(self.class_)
 
     def alias(self, value_name: str) -> str | None:
         match value_name:
@@ -44,33 +183,73 @@ class HTMLTag(Tag):
         return value_name
 
     @property
-    def full_attrs(self) -> str:  # dict[str, str]:
+    def attr_fields(self) -> tuple[tuple[str, str], ...]:
+        # (field name, html attribute name) pairs, resolved through `alias` once per class
+        cls = type(self)
+        if (attrs := _attr_fields_cache.get(cls)) is None:
+            attrs = tuple((f.name, ni) for f in fields(cls) if (ni := self.alias(f.name)))
+            _attr_fields_cache[cls] = attrs
+        return attrs
+
+    @property
+    def attr_readers(self) -> tuple[tuple[tuple[Callable[[Any], Any], str], ...], Callable[[Any], Any]]:
+        # `attr_fields` as readers that leave empty lazy fields unallocated, and the reader of `extra_attrs`
+        cls = type(self)
+        if (readers := _attr_readers_cache.get(cls)) is None:
+            attrs = tuple((field_reader(cls, i), ni) for i, ni in self.attr_fields)
+            readers = _attr_readers_cache[cls] = (attrs, field_reader(cls, "extra_attrs"))
+        return readers
+
+    @property
+    def raw_attrs(self) -> dict[str, object | str | None]:
+        attrs, read_extra_attrs = self.attr_readers
         raw_full_attrs: dict[str, object | str | None]
-        raw_full_attrs = asdict(self)
-        raw_full_attrs = {ni: v for i, v in raw_full_attrs.items() if (ni := self.alias(i))}
-        raw_full_attrs |= self.extra_attrs
+        raw_full_attrs = {ni: read(self) for read, ni in attrs}
+        if extra_attrs := read_extra_attrs(self):
+            raw_full_attrs |= extra_attrs
+        return raw_full_attrs
 
+    @property
+    def full_attrs(self) -> str:  # dict[str, str]:
         full_attrs: list[str] = []
-        for attr_name, attr_value in raw_full_attrs.items():
-            if attr_value is None:
-                continue
-
-            if not isinstance(attr_value, bool) and not attr_value:
-                continue
-
-            match attr_value:
-                case list():
-                    full_attrs.append(f'{attr_name}="{" ".join(attr_value)}"')
-                case bool():
-                    if attr_value:
-                        full_attrs.append(f"{attr_name}")
-                case _:
-                    full_attrs.append(f'{attr_name}="{attr_value}"')
+        for attr_name, attr_value in self.raw_attrs.items():
+            if attr := format_attr(attr_name, attr_value):
+                full_attrs.append(attr)
 
         return " ".join(full_attrs)
 
-
-@dataclass
+    @property
+    def compact_attrs(self) -> str:
+        # attributes with a leading space each, "" for none; empty values are skipped before anything is built
+        compact_attrs = ""
+        attrs, read_extra_attrs = self.attr_readers
+        if read_extra_attrs(self):
+            items = list(self.raw_attrs.items())
+        else:
+            items = [(ni, read(self)) for read, ni in attrs]
+        for attr_name, attr_value in items:
+            # a false value (None, "", False, empty style) is never written
+            if attr_value:
+                compact_attrs += " " + format_attr(attr_name, attr_value, True)
+        return compact_attrs
+
+    def start_tag(self, name: str, compact: bool = False) -> str:
+        if compact:
+            return f"<{name}{self.compact_attrs}>"
+        return f"<{name} {self.full_attrs}>"
+
+    def iter_container(self, name: str, tags: list[Tag], compact: bool = False) -> Iterator[str]:
+        yield self.start_tag(name, compact)
+        if not compact:
+            yield "\n"
+        for i, tag in enumerate(tags):
+            if i and not compact:
+                yield "\n"
+            yield from tag.iter_render(compact)
+        yield f"</{name}>" if compact else f"\n</{name}>"
+
+
+@dataclass(slots=True)
 class DivTag(HTMLTag, Tags):
     def alias(self, value_name: str) -> str | None:
         match value_name:
@@ -78,19 +257,17 @@ class DivTag(HTMLTag, Tags):
                 return None
         return HTMLTag.alias(self, value_name)
 
-    def __str__(self) -> str:
-        inner_tags = Tags.__str__(self)
-        return f"<div {self.full_attrs}>\n{inner_tags}\n</div>"
+    def iter_render(self, compact: bool = False) -> Iterator[str]:
+        return self.iter_container("div", self.tags, compact)
 
 
-@dataclass
+@dataclass(slots=True)
 class PTag(DivTag):
-    def __str__(self) -> str:
-        inner_tags = Tags.__str__(self)
-        return f"<p {self.full_attrs}>\n{inner_tags}\n</p>"
+    def iter_render(self, compact: bool = False) -> Iterator[str]:
+        return self.iter_container("p", self.tags, compact)
 
 
-@dataclass
+@dataclass(slots=True)
 class BaseInput(HTMLTag):
     type_: str = ""
     name: str = ""
@@ -101,59 +278,138 @@ class BaseInput(HTMLTag):
         match value_name:
             case "type_":
                 return "type"
-        return super().alias(value_name)
+        return HTMLTag.alias(self, value_name)
 
-    def __str__(self) -> str:
+    def iter_render(self, compact: bool = False) -> Iterator[str]:
         raise NotImplementedError
 
 
-@dataclass
+@dataclass(slots=True)
 class InputTag(BaseInput):
     placeholder: str = ""
 
     checked: bool | None = None
 
-    def __str__(self) -> str:
-        return f"<input {self.full_attrs}>"
+    def iter_render(self, compact: bool = False) -> Iterator[str]:
+        yield self.start_tag("input", compact)
 
 
-@dataclass
+@dataclass(slots=True)
 class TextareaTag(BaseInput):
     def alias(self, value_name: str) -> str | None:
         match value_name:
             case "value":
                 return None
-        return super().alias(value_name)
+        return BaseInput.alias(self, value_name)
 
-    def __str__(self) -> str:
-        return f"<textarea {self.full_attrs}>{self.value}</textarea>"
+    def iter_render(self, compact: bool = False) -> Iterator[str]:
+        yield f"{self.start_tag('textarea', compact)}{escape(self.value, quote=False)}</textarea>"
 
 
-@dataclass
+@dataclass(slots=True)
 class ButtonTag(BaseInput):
     def alias(self, value_name: str) -> str | None:
         match value_name:
             case "value":
                 return None
-        return super().alias(value_name)
+        return BaseInput.alias(self, value_name)
 
-    def __str__(self) -> str:
-        return f"<button {self.full_attrs}>{self.value}</button>"
+    def iter_render(self, compact: bool = False) -> Iterator[str]:
+        yield f"{self.start_tag('button', compact)}{escape(self.value, quote=False)}</button>"
 
 
-@dataclass
+@dataclass(slots=True)
 class OptionTag(HTMLTag):
     value: str = ""
     selected: bool | None = None
 
-    def __str__(self) -> str:
-        return f"<option {self.full_attrs}>{self.value}</option>"
-
-
-@dataclass
+    def iter_render(self, compact: bool = False) -> Iterator[str]:
+        yield f"{self.start_tag('option', compact)}{escape(self.value, quote=False)}</option>"
+
+
+@dataclass(slots=True, eq=False)
+class OptionList:
+    # options of a fixed list of values (an enum), rendered once per mode; a render only splices in `selected` ones
+    values: tuple[object, ...]  # what a bound value is compared with
+    labels: tuple[str, ...]  # value and text of every option
+    # lookup value -> positions of the options equal to it, several for enum aliases
+    positions: dict[Hashable, tuple[int, ...]]
+    # compact -> (all options joined, offset of every option and of the end)
+    _markup: dict[bool, tuple[str, tuple[int, ...]]] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, values: Sequence[object]) -> "OptionList":
+        # raises TypeError on unhashable values
+        positions: dict[Hashable, list[int]] = {}
+        for i, value in enumerate(values):
+            keys = [value]
+            # members of mixin enums (`class E(str, Enum)`) equal their raw value, which hashes differently
+            if isinstance(value, Enum) and value == value.value:
+                keys.append(value.value)
+            for key in keys:
+                found = positions.setdefault(key, [])
+                if i not in found[-1:]:
+                    found.append(i)
+        return cls(
+            values=tuple(values),
+            labels=tuple(map(str, values)),
+            positions={value: tuple(found) for value, found in positions.items()},
+        )
+
+    def select(self, value: object) -> tuple[int, ...]:
+        # positions of the options equal to `value`
+        try:
+            return self.positions.get(value, ())  # type: ignore[arg-type]
+        except TypeError:  # unhashable, compared the slow way
+            return tuple(i for i, option in enumerate(self.values) if option == value)
+
+    def select_any(self, values: Iterable[object]) -> tuple[int, ...]:
+        return tuple(sorted({i for value in values for i in self.select(value)}))
+
+    def markup(self, compact: bool = False) -> tuple[str, tuple[int, ...]]:
+        if (markup := self._markup.get(compact)) is None:
+            separator = "" if compact else "\n"
+            rendered = [OptionTag(value=label).render(compact) for label in self.labels]
+            offsets = [0]
+            for option in rendered:
+                offsets.append(offsets[-1] + len(option) + len(separator))
+            markup = self._markup.setdefault(compact, (separator.join(rendered), tuple(offsets)))
+        return markup
+
+    def iter_render(self, selected: Sequence[int] = (), compact: bool = False) -> Iterator[str]:
+        # `selected` positions in ascending order
+        joined, offsets = self.markup(compact)
+        separator = 0 if compact else 1
+        pos = 0
+        for i in selected:
+            yield joined[pos : offsets[i]]
+            yield OptionTag(value=self.labels[i], selected=True).render(compact)
+            pos = offsets[i + 1] - separator
+        yield joined[pos:]
+
+
+@dataclass(slots=True)
+class SelectedOptions(Tag):
+    # the options of a select as one tag; iterating gives the equivalent `OptionTag`s, for code that walks the tree
+    options: OptionList
+    selected: tuple[int, ...] = ()
+
+    def iter_render(self, compact: bool = False) -> Iterator[str]:
+        return self.options.iter_render(self.selected, compact)
+
+    def __iter__(self) -> Iterator[OptionTag]:
+        selected = set(self.selected)
+        return (OptionTag(value=label, selected=i in selected) for i, label in enumerate(self.options.labels))
+
+    def __len__(self) -> int:
+        return len(self.options.labels)
+
+
+@dataclass(slots=True)
 class SelectTag(HTMLTag):
     name: str = ""
-    options: list[OptionTag] = field(default_factory=list)
+    # a `Tag` (usually `SelectedOptions`) is rendered as the whole option list
+    options: list[OptionTag] | Tag = field(default_factory=list)
     multiple: bool | None = None
     disabled: bool | None = None
 
@@ -161,14 +417,21 @@ class SelectTag(HTMLTag):
         match value_name:
             case "options":
                 return None
-        return super().alias(value_name)
+        return HTMLTag.alias(self, value_name)
 
-    def __str__(self) -> str:
-        options = "\n".join(map(str, self.options))
-        return f"<select {self.full_attrs}>{options}</select>"
+    def iter_render(self, compact: bool = False) -> Iterator[str]:
+        yield self.start_tag("select", compact)
+        if isinstance(self.options, Tag):
+            yield from self.options.iter_render(compact)
+        else:
+            for i, option in enumerate(self.options):
+                if i and not compact:
+                    yield "\n"
+                yield from option.iter_render(compact)
+        yield "</select>"
 
 
-@dataclass
+@dataclass(slots=True)
 class LabelTag(HTMLTag):
     label: str = ""
 
@@ -176,33 +439,55 @@ class LabelTag(HTMLTag):
         match value_name:
             case "label":
                 return None
-        return super().alias(value_name)
+        return HTMLTag.alias(self, value_name)
 
-    def __str__(self) -> str:
-        return f"<label {self.full_attrs}>{self.label}</label>"
+    def iter_render(self, compact: bool = False) -> Iterator[str]:
+        yield f"{self.start_tag('label', compact)}{escape(self.label, quote=False)}</label>"
 
 
-@dataclass
+@dataclass(slots=True)
 class FormTag(HTMLTag, Tags):
     def alias(self, value_name: str) -> str | None:
         match value_name:
             case "tags":
                 return None
-        return super().alias(value_name)
+        return HTMLTag.alias(self, value_name)
 
-    def __str__(self) -> str:
-        inner_tags = Tags.__str__(self)
-        return f"<form {self.full_attrs}>\n{inner_tags}\n</form>"
+    def iter_render(self, compact: bool = False) -> Iterator[str]:
+        return self.iter_container("form", self.tags, compact)
 
 
-@dataclass
+@dataclass(slots=True)
 class FieldsetTag(HTMLTag, Tags):
     def alias(self, value_name: str) -> str | None:
         match value_name:
             case "tags":
                 return None
-        return super().alias(value_name)
+        return HTMLTag.alias(self, value_name)
 
-    def __str__(self) -> str:
-        inner_tags = Tags.__str__(self)
-        return f"<fieldset {self.full_attrs}>\n{inner_tags}\n</fieldset>"
+    def iter_render(self, compact: bool = False) -> Iterator[str]:
+        return self.iter_container("fieldset", self.tags, compact)
+
+
+@dataclass(slots=True)
+class TableTag(DivTag):
+    def iter_render(self, compact: bool = False) -> Iterator[str]:
+        return self.iter_container("table", self.tags, compact)
+
+
+@dataclass(slots=True)
+class TrTag(DivTag):
+    def iter_render(self, compact: bool = False) -> Iterator[str]:
+        return self.iter_container("tr", self.tags, compact)
+
+
+@dataclass(slots=True)
+class ThTag(DivTag):
+    def iter_render(self, compact: bool = False) -> Iterator[str]:
+        return self.iter_container("th", self.tags, compact)
+
+
+@dataclass(slots=True)
+class TdTag(DivTag):
+    def iter_render(self, compact: bool = False) -> Iterator[str]:
+        return self.iter_container("td", self.tags, compact)
@@ -0,0 +1,25 @@
+import pytest
+from models import HOSTILE, Inner, Outer, Wide
+
+from formgen import gen1, gen2
+
+
+@pytest.fixture(autouse=True)
+def cold_caches() -> None:
+    gen2.clear_plan_cache()
+    gen1.clear_schema_cache()
+
+
+@pytest.fixture
+def outer() -> Outer:
+    return Outer(name="x'y", inner=Inner(count=3, note="n & m"))
+
+
+@pytest.fixture
+def hostile() -> Outer:
+    return Outer(name=HOSTILE, inner=Inner(note=HOSTILE))
+
+
+@pytest.fixture
+def wide() -> Wide:
+    return Wide(title=HOSTILE, tags=["x", "<y>"], extra={"k": "v"}, maybe=3, choice="c")
@@ -0,0 +1,48 @@
+from enum import Enum
+from typing import Annotated, Literal
+
+from pydantic import BaseModel, Field
+
+HOSTILE = "<script>alert(\"x\" & 'y')</script>"
+
+
+class Color(str, Enum):
+    red = "red"
+    green = "green"
+    blue = "blue"
+
+
+class Inner(BaseModel):
+    count: int = 1
+    note: str = "note"
+
+
+class Cat(BaseModel):
+    kind: Literal["cat"] = "cat"
+    lives: int = 9
+
+
+class Dog(BaseModel):
+    kind: Literal["dog"] = "dog"
+    name: str = "rex"
+
+
+class Outer(BaseModel):
+    name: str = "name"
+    color: Color = Color.green
+    colors: list[Color] = Field(default_factory=lambda: [Color.red, Color.blue])
+    inner: Inner = Field(default_factory=Inner)
+    flag: bool = True
+
+
+class Wide(BaseModel):
+    title: str = "title"
+    size: Literal["s", "m", "l"] = "m"
+    tags: list[str] = Field(default_factory=lambda: ["a", "b"])
+    extra: dict[str, str] = Field(default_factory=dict)
+    maybe: int | None = None
+    choice: int | str = 1
+    pet: Annotated[Cat | Dog, Field(discriminator="kind")] = Field(default_factory=Dog)
+    inner: Inner = Field(default_factory=Inner)
+    color: Color = Color.blue
+    description: str = "line 1\nline 2"
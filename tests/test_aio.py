@@ -0,0 +1,93 @@
+import asyncio
+from collections.abc import AsyncIterator
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+from models import Outer, Wide
+
+from formgen.budget import Budget, RenderBudgetExceeded, render_budget
+from formgen.fragments import FragmentCache, use_fragment_cache
+from formgen.gen2 import generate_form
+from formgen.gen2.aio import aiter_render, aiter_render_form, generate_form_async
+from formgen.gen2.template import render_form
+from formgen.instrument import profiling
+
+
+async def collect(chunks: AsyncIterator[str]) -> str:
+    return "".join([chunk async for chunk in chunks])
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_output_matches_sync(wide: Wide, compact: bool) -> None:
+    async def main() -> None:
+        form = await generate_form_async(Wide, wide, form_id="f")
+        assert form.render(compact) == generate_form(Wide, wide, form_id="f").render(compact)
+        assert await collect(aiter_render(form, chunk_size=64, compact=compact)) == form.render(compact)
+        rendered = await collect(aiter_render_form(Wide, wide, chunk_size=64, compact=compact))
+        assert rendered == render_form(Wide, wide, compact=compact)
+
+    asyncio.run(main())
+
+
+def test_thread_pool_executor(outer: Outer) -> None:
+    async def main() -> None:
+        with ThreadPoolExecutor(2) as executor:
+            form = await generate_form_async(Outer, outer, executor=executor)
+            assert str(form) == str(generate_form(Outer, outer))
+            assert await collect(aiter_render_form(Outer, outer, executor=executor)) == render_form(Outer, outer)
+
+    asyncio.run(main())
+
+
+def test_process_pool_is_rejected(outer: Outer) -> None:
+    async def main() -> None:
+        with ProcessPoolExecutor(1) as executor:
+            with pytest.raises(TypeError, match="thread pool"):
+                await generate_form_async(Outer, outer, executor=executor)
+            with pytest.raises(TypeError, match="thread pool"):
+                await collect(aiter_render_form(Outer, outer, executor=executor))
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize(
+    "budget",
+    [
+        Budget(max_nodes=20, placeholder=True),
+        Budget(max_depth=1, placeholder=True),
+        Budget(max_depth=0, placeholder=True),
+    ],
+)
+def test_budget_placeholders_match_sync(wide: Wide, budget: Budget) -> None:
+    with render_budget(budget):
+        expected = str(generate_form(Wide, wide))
+
+    async def main() -> str:
+        with render_budget(budget):
+            return str(await generate_form_async(Wide, wide))
+
+    assert asyncio.run(main()) == expected
+    assert "RENDER BUDGET EXCEEDED" in expected
+
+
+def test_budget_raises(wide: Wide) -> None:
+    async def main() -> None:
+        with render_budget(Budget(max_depth=1)), pytest.raises(RenderBudgetExceeded):
+            await generate_form_async(Wide, wide)
+
+    asyncio.run(main())
+
+
+def test_fragment_cache_and_profiler_see_jobs(wide: Wide) -> None:
+    async def main() -> None:
+        cache = FragmentCache()
+        with use_fragment_cache(cache):
+            await generate_form_async(Wide, wide)
+            await generate_form_async(Wide, wide)
+        assert cache.stats()["hits"] > 0
+
+        with profiling() as profiler:
+            await generate_form_async(Wide, wide)
+        assert profiler.by_type
+
+    asyncio.run(main())
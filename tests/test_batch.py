@@ -0,0 +1,39 @@
+from models import Inner, Outer
+
+from formgen.gen2.batch import iter_forms, iter_render_forms, render_forms
+from formgen.gen2.template import render_form
+
+MODELS = [Outer(name=str(i), inner=Inner(count=i)) for i in range(5)] + [None]
+
+
+def test_forms_match_single_renders() -> None:
+    expected = [render_form(Outer, model, form_id=f"form-{i}", form_class="c") for i, model in enumerate(MODELS)]
+    assert render_forms(Outer, MODELS, form_id="form-{index}", form_class="c") == expected
+    assert ["".join(form) for form in iter_forms(Outer, MODELS, form_id="form-{index}", form_class="c")] == expected
+    assert "".join(iter_render_forms(Outer, MODELS, form_id="form-{index}", form_class="c")) == "".join(expected)
+
+
+def test_start_offsets_form_ids() -> None:
+    forms = render_forms(Outer, MODELS[:2], form_id="f{index}", start=10)
+    assert forms == [render_form(Outer, model, form_id=f"f{10 + i}") for i, model in enumerate(MODELS[:2])]
+
+
+def test_compact_and_options() -> None:
+    options = {"readonly": True, "disabled_fields": ["name"], "compact": True}
+    assert render_forms(Outer, MODELS, **options) == [render_form(Outer, model, **options) for model in MODELS]
+
+
+def test_processes_keep_the_order() -> None:
+    models = [Outer(name=str(i)) for i in range(40)]
+    expected = render_forms(Outer, models, form_id="f{index}")
+    assert render_forms(Outer, models, form_id="f{index}", processes=2, chunk_size=7) == expected
+
+
+class Fancier(Outer):
+    motto: str = "more"
+
+
+def test_models_of_several_types() -> None:
+    models = [Outer(), Fancier(), Outer(name="x"), Fancier(motto="<less>")]
+    assert render_forms(Outer, models) == [render_form(Outer, model) for model in models]
+    assert "motto" in render_forms(Outer, models)[1]
@@ -0,0 +1,113 @@
+from collections.abc import Callable
+
+import pytest
+from models import Outer, Wide
+from pydantic import BaseModel
+
+from formgen import gen1, gen2
+from formgen.budget import Budget, RenderBudgetExceeded, render_budget
+from formgen.gen2.template import render_form
+
+PLACEHOLDER = "RENDER BUDGET EXCEEDED"
+
+
+# a required self reference, so every level renders the next one
+class Loop(BaseModel):
+    name: str = "loop"
+    child: "Loop"
+
+
+NODE = {"title": "Node", "type": "object", "properties": {"name": {"title": "Name", "type": "string"}}}
+LOOP_SCHEMA = {
+    "title": "Loop",
+    "type": "object",
+    "properties": {"name": {"title": "Name", "type": "string"}, "child": {"$ref": "#/definitions/Loop"}},
+    "definitions": {
+        "Loop": {
+            "title": "Loop",
+            "type": "object",
+            "properties": {"name": {"title": "Name", "type": "string"}, "child": {"$ref": "#/definitions/Loop"}},
+        },
+    },
+}
+LAYERED_SCHEMA = {
+    "title": "Layered",
+    "type": "object",
+    "properties": {f"node_{i}": {"$ref": "#/definitions/Node"} for i in range(8)},
+    "definitions": {"Node": NODE},
+}
+
+RENDERS: dict[str, Callable[[type[BaseModel]], str]] = {
+    "tree": lambda model_type: str(gen2.generate_form(model_type)),
+    "template": lambda model_type: render_form(model_type),
+}
+
+
+@pytest.mark.parametrize("render", RENDERS.values(), ids=RENDERS.keys())
+def test_default_depth_stops_self_reference(render: Callable) -> None:
+    with render_budget(), pytest.raises(RenderBudgetExceeded) as exceeded:
+        render(Loop)
+    assert exceeded.value.limit == "max_depth"
+    assert exceeded.value.value == 32
+
+    with render_budget(Budget(placeholder=True)):
+        assert PLACEHOLDER in render(Loop)
+
+
+@pytest.mark.parametrize("render", RENDERS.values(), ids=RENDERS.keys())
+def test_unlimited_depth_raises_instead_of_recursion_error(render: Callable) -> None:
+    for budget in (Budget(max_depth=None), Budget(max_depth=None, placeholder=True)):
+        with render_budget(budget), pytest.raises(RenderBudgetExceeded, match="max_depth"):
+            render(Loop)
+
+
+def test_gen1_unlimited_depth_raises_instead_of_recursion_error() -> None:
+    with render_budget(Budget(max_depth=None)), pytest.raises(RenderBudgetExceeded, match="max_depth"):
+        gen1.generate_form(LOOP_SCHEMA)
+
+
+@pytest.mark.parametrize("render", RENDERS.values(), ids=RENDERS.keys())
+def test_node_budget(render: Callable, wide: Wide) -> None:
+    with render_budget(Budget(max_depth=None, max_nodes=100, placeholder=True)):
+        assert PLACEHOLDER in render(Loop)
+    with render_budget(Budget(max_nodes=10)), pytest.raises(RenderBudgetExceeded, match="max_nodes"):
+        render(Wide)
+    with render_budget(Budget(max_nodes=1000)):
+        assert PLACEHOLDER not in render(Wide)
+
+
+def test_template_pays_like_the_tree(wide: Wide) -> None:
+    with render_budget() as tree:
+        gen2.generate_form(Wide, wide)
+    with render_budget() as template:
+        render_form(Wide, wide)
+    assert template.nodes == tree.nodes > 0
+
+
+def test_template_byte_limit(outer: Outer) -> None:
+    with render_budget() as state:
+        html = render_form(Outer, outer)
+    # nested templates stream into their parent, their bytes aren't counted twice
+    assert 0 < state.bytes < len(html.encode())
+
+    with render_budget(Budget(max_bytes=state.bytes)):
+        assert render_form(Outer, outer) == html
+    with render_budget(Budget(max_bytes=state.bytes - 1, placeholder=True)), pytest.raises(RenderBudgetExceeded):
+        render_form(Outer, outer)
+
+
+def test_gen1_memoized_subforms_are_counted() -> None:
+    with render_budget(Budget(max_nodes=20)) as cold, pytest.raises(RenderBudgetExceeded):
+        gen1.generate_form(LAYERED_SCHEMA)
+
+    # fills the memo of definition subforms
+    unbudgeted = str(gen1.generate_form(LAYERED_SCHEMA))
+    with render_budget(Budget(max_nodes=20)) as warm, pytest.raises(RenderBudgetExceeded):
+        gen1.generate_form(LAYERED_SCHEMA)
+    assert warm.nodes == cold.nodes
+
+    with render_budget(Budget(max_depth=1)), pytest.raises(RenderBudgetExceeded, match="max_depth"):
+        gen1.generate_form(LAYERED_SCHEMA)
+    with render_budget(Budget(max_nodes=20, placeholder=True)):
+        assert PLACEHOLDER in str(gen1.generate_form(LAYERED_SCHEMA))
+    assert str(gen1.generate_form(LAYERED_SCHEMA)) == unbudgeted
@@ -0,0 +1,107 @@
+import pytest
+from models import HOSTILE, Outer
+from pydantic import BaseModel
+
+from formgen import gen1, gen2
+from formgen.gen1.schema import Types
+from formgen.gen2 import Context, Contexts, FieldType
+from formgen.gen2.template import render_form
+from formgen.ir import to_ir
+from formgen.tags import DivTag, InputTag, LabelTag, Markup, TextareaTag, escape, format_attr, write_attr
+
+ESCAPED = "&lt;script&gt;alert(&quot;x&quot; &amp; &#x27;y&#x27;)&lt;/script&gt;"
+
+
+def test_escape_attribute_values() -> None:
+    assert escape("<>&\"'") == "&lt;&gt;&amp;&quot;&#x27;"
+    assert escape(HOSTILE) == ESCAPED
+    assert escape(42) == "42"
+
+
+def test_escape_text_keeps_quotes() -> None:
+    assert escape("<>&\"'", quote=False) == "&lt;&gt;&amp;\"'"
+
+
+def test_escape_plain_value_is_returned_as_is() -> None:
+    value = "form-control col-2"
+    assert escape(value) is value
+
+
+def test_markup_passes_through() -> None:
+    assert escape(Markup("<b>&amp;</b>")) == "<b>&amp;</b>"
+    assert str(InputTag(value=Markup("&amp;"))) == '<input value="&amp;">'
+    assert str(LabelTag(label=Markup("<b>x</b>"))) == "<label ><b>x</b></label>"
+
+
+def test_tags_escape_attributes_and_text() -> None:
+    assert str(InputTag(value=HOSTILE)) == f'<input value="{ESCAPED}">'
+    assert str(TextareaTag(value="<a> & 'b'")) == "<textarea >&lt;a&gt; &amp; 'b'</textarea>"
+    assert format_attr("class", ["a", '"b"']) == 'class="a &quot;b&quot;"'
+    assert 'class="x&lt;"' in str(DivTag(class_="x<"))
+
+
+def test_compact_attributes_stay_quoted_when_needed() -> None:
+    assert write_attr("name", "plain", compact=True) == "name=plain"
+    assert write_attr("name", "two words", compact=True) == 'name="two words"'
+    assert write_attr("name", "a=b", compact=True) == 'name="a=b"'
+    # entities are fine unquoted
+    assert write_attr("name", escape("a'b"), compact=True) == "name=a&#x27;b"
+    assert write_attr("name", "", compact=True) == 'name=""'
+
+
+def test_forms_escape_model_values(hostile: Outer) -> None:
+    schema = Outer.model_json_schema()
+    forms = {
+        "tree": str(gen2.generate_form(Outer, hostile)),
+        "compact tree": gen2.generate_form(Outer, hostile).render(compact=True),
+        "template": render_form(Outer, hostile),
+        "ir": to_ir(gen2.generate_form(Outer, hostile)).render(),
+        "gen1": str(gen1.generate_form(schema, values=hostile.model_dump(mode="json"))),
+    }
+    for name, html in forms.items():
+        assert HOSTILE not in html, name
+        assert "<script>" not in html, name
+        assert ESCAPED in html, name
+    assert forms["tree"] == forms["template"] == forms["ir"]
+
+
+class Page(BaseModel):
+    body: str = "<h1>title</h1>"
+
+
+def html_contexts(trusted: bool) -> Contexts:
+    return Contexts({"body": Context(override=FieldType.HTML, trusted_html=trusted)})
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_html_preview_is_text_unless_trusted(compact: bool) -> None:
+    for contexts in (None, html_contexts(trusted=False)):
+        tree = gen2.generate_form(Page, Page(body=HOSTILE), contexts=contexts).render(compact)
+        assert render_form(Page, Page(body=HOSTILE), contexts=contexts, compact=compact) == tree
+        assert "<script>" not in tree
+
+    # `Markup` doesn't survive validation, only the context can trust a value
+    assert "<h1>" not in str(gen2.generate_form(Page, Page(body=Markup("<h1>x</h1>")), contexts=html_contexts(False)))
+
+    trusted = gen2.generate_form(Page, Page(), contexts=html_contexts(trusted=True)).render(compact)
+    assert render_form(Page, Page(), contexts=html_contexts(trusted=True), compact=compact) == trusted
+    assert "<h1>title</h1>" in trusted
+
+
+def test_trusted_html_is_part_of_the_keys() -> None:
+    escaped = str(gen2.generate_form(Page, Page(), contexts=html_contexts(trusted=False)))
+    assert str(gen2.generate_form(Page, Page(), contexts=html_contexts(trusted=True))) != escaped
+    assert str(gen2.generate_form(Page, Page(), contexts=html_contexts(trusted=False))) == escaped
+    fingerprints = {gen2.form_fingerprint(Page, Page(), contexts=html_contexts(trusted)) for trusted in (False, True)}
+    assert len(fingerprints) == 2
+
+
+def test_gen1_html_preview_is_text_unless_markup() -> None:
+    schema = {"title": "Page", "type": "object", "properties": {"body": {"title": "Body", "type": "string"}}}
+    html = str(gen1.generate_form(schema, values={"body": HOSTILE}, overrides={"body": Types.html}))
+    # text content, quotes stay as they are
+    assert escape(HOSTILE, quote=False) in html
+    assert "<script>" not in html
+    assert "<h1>x</h1>" in str(
+        gen1.generate_form(schema, values={"body": Markup("<h1>x</h1>")}, overrides={"body": Types.html})
+    )
@@ -0,0 +1,87 @@
+import pytest
+from models import Inner, Outer
+from pydantic import BaseModel
+
+from formgen import gen1, gen2
+from formgen.gen1.schema import Model
+
+SCHEMA = Outer.model_json_schema()
+
+
+class Base(BaseModel):
+    a: int = 1
+
+
+class Child(Base):
+    secret: int = 0
+
+
+class Wrapper(BaseModel):
+    sub: Base
+
+
+class Opaque:
+    pass
+
+
+def test_gen2_follows_what_is_rendered(outer: Outer) -> None:
+    same = gen2.form_fingerprint(Outer, outer, form_id="f")
+    assert gen2.form_fingerprint(Outer, outer.model_copy(deep=True), form_id="f") == same
+    assert gen2.form_fingerprint(Outer, outer, form_id="g") != same
+    assert gen2.form_fingerprint(Outer, outer, form_id="f", readonly=True) != same
+    assert gen2.form_fingerprint(Outer, outer, form_id="f", disabled_fields=["name"]) != same
+    assert gen2.form_fingerprint(Outer, Outer(name="other"), form_id="f") != same
+    assert gen2.form_fingerprint(Inner, None) != gen2.form_fingerprint(Outer, None)
+
+
+def test_gen2_follows_runtime_types() -> None:
+    same = gen2.form_fingerprint(Wrapper, Wrapper(sub=Child(secret=1)))
+    assert gen2.form_fingerprint(Wrapper, Wrapper(sub=Child(secret=1))) == same
+    assert gen2.form_fingerprint(Wrapper, Wrapper(sub=Child(secret=2))) != same
+    assert gen2.form_fingerprint(Wrapper, Wrapper(sub=Base())) != same
+
+
+def test_gen1_follows_what_is_rendered() -> None:
+    same = gen1.form_fingerprint(SCHEMA, form_id="f", values={"name": "x"})
+    assert gen1.form_fingerprint(dict(SCHEMA), form_id="f", values={"name": "x"}) == same
+    assert gen1.form_fingerprint(SCHEMA, form_id="f", values={"name": "y"}) != same
+    assert gen1.form_fingerprint(SCHEMA, form_id="f", values={"name": "x"}, attribs={"name": {"a": "b"}}) != same
+    assert gen1.form_fingerprint(Inner.model_json_schema(), form_id="f", values={"name": "x"}) != same
+
+
+def test_gen1_values_keep_types_apart() -> None:
+    assert gen1.form_fingerprint(SCHEMA, values={"name": 1}) != gen1.form_fingerprint(SCHEMA, values={"name": "1"})
+    assert gen1.form_fingerprint(SCHEMA, values={"n": [1]}) != gen1.form_fingerprint(SCHEMA, values={"n": (1,)})
+
+
+def test_gen1_unkeyable_values_never_match() -> None:
+    values = {"name": Opaque()}
+    assert gen1.form_fingerprint(SCHEMA, values=values) != gen1.form_fingerprint(SCHEMA, values=values)
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_gen1_parsed_schema_matches_its_document(lazy: bool) -> None:
+    parsed = gen1.parse_schema(SCHEMA, lazy=lazy)
+    assert gen1.form_fingerprint(parsed, values={"name": "x"}) == gen1.form_fingerprint(SCHEMA, values={"name": "x"})
+
+
+def test_gen1_lazy_schema_includes_its_definitions() -> None:
+    other = SCHEMA | {"$defs": {**SCHEMA["$defs"], "Inner": {**SCHEMA["$defs"]["Inner"], "title": "Changed"}}}
+    assert gen1.form_fingerprint(gen1.parse_schema(SCHEMA, lazy=True)) != gen1.form_fingerprint(
+        gen1.parse_schema(other, lazy=True),
+    )
+
+
+def test_gen1_model_is_dumped_once(monkeypatch: pytest.MonkeyPatch) -> None:
+    model = Model.model_validate(SCHEMA)
+    same = gen1.form_fingerprint(model)
+    parsed = gen1.parse_schema(SCHEMA)
+
+    def dump(*args: object, **kwargs: object) -> None:
+        raise AssertionError("dumped again")
+
+    monkeypatch.setattr(Model, "model_dump", dump)
+    monkeypatch.setattr(gen1, "schema_fingerprint", dump)
+    assert gen1.form_fingerprint(model) == same
+    # known documents are found by identity
+    assert gen1.form_fingerprint(parsed) == gen1.form_fingerprint(SCHEMA)
@@ -0,0 +1,249 @@
+import gzip
+import os
+import sqlite3
+import subprocess
+import sys
+from datetime import date
+from pathlib import Path
+
+import pytest
+from models import Inner, Outer, Wide
+from pydantic import BaseModel, Field
+
+from formgen import gen2
+from formgen.budget import Budget, render_budget
+from formgen.fragments import (
+    ENCODINGS,
+    MARKUP_VERSION,
+    Fragment,
+    FragmentCache,
+    SqliteFragmentCache,
+    choose_encoding,
+    current_fragment_cache,
+    stable_key,
+    use_fragment_cache,
+    value_key,
+)
+from formgen.tags import Tag
+
+
+class Base(BaseModel):
+    a: int = 1
+
+
+class Child(Base):
+    secret: int = 0
+
+
+class Wrapper(BaseModel):
+    sub: Base
+    hidden: str = Field("", exclude=True)
+
+
+def test_value_key_uses_runtime_types() -> None:
+    assert value_key(Wrapper(sub=Child(secret=1))) != value_key(Wrapper(sub=Child(secret=2)))
+    assert value_key(Wrapper(sub=Base())) != value_key(Wrapper(sub=Child()))
+
+
+def test_value_key_includes_excluded_fields() -> None:
+    assert value_key(Wrapper(sub=Base(), hidden="a")) != value_key(Wrapper(sub=Base(), hidden="b"))
+
+
+def test_value_key_equal_values() -> None:
+    assert value_key(Wrapper(sub=Child(secret=1))) == value_key(Wrapper(sub=Child(secret=1)))
+    assert value_key({"a": [1, 2]}) == value_key({"a": [1, 2]})
+    assert value_key({3, 1, 2}) == value_key({2, 3, 1})
+
+
+def test_value_key_keeps_types_apart() -> None:
+    assert len({value_key(1), value_key(1.0), value_key(True), value_key("1")}) == 4
+    assert value_key([1]) != value_key((1,))
+
+
+def test_value_key_refuses_unkeyable_values() -> None:
+    class Opaque:
+        pass
+
+    assert value_key(Opaque()) is None
+    assert value_key([1, Opaque()]) is None
+    assert value_key(bytearray(b"x")) is None
+
+
+def test_use_fragment_cache_is_scoped() -> None:
+    cache = FragmentCache()
+    with use_fragment_cache(cache) as active:
+        assert active is current_fragment_cache() is cache
+    assert current_fragment_cache() is None
+
+
+def test_lru_eviction() -> None:
+    cache = FragmentCache(max_bytes=10)
+    cache.put("a", "aaaa")
+    cache.put("b", "bbbb")
+    assert cache.get("a") == "aaaa"  # b is the least recently used now
+    cache.put("c", "cccc")
+    assert cache.get("b") is None
+    assert cache.get("a") == "aaaa"
+    assert cache.get("c") == "cccc"
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] == 8
+
+
+def test_oversized_fragments_are_not_stored() -> None:
+    cache = FragmentCache(max_bytes=4)
+    cache.put("a", "aaaaa")
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_cached_forms_match_uncached(outer: Outer, wide: Wide) -> None:
+    for model_type, model in ((Outer, outer), (Wide, wide), (Wide, None)):
+        reference = str(gen2.generate_form(model_type, model))
+        with use_fragment_cache(FragmentCache()) as cache:
+            assert str(gen2.generate_form(model_type, model)) == reference
+            assert str(gen2.generate_form(model_type, model)) == reference
+        assert cache.hits > 0
+
+    with use_fragment_cache(FragmentCache()):
+        gen2.generate_form(Outer, outer)
+        other = Outer(name="other")
+        assert str(gen2.generate_form(Outer, other)) != str(gen2.generate_form(Outer, outer))
+
+
+def test_budget_placeholders_are_not_cached() -> None:
+    class Deep(BaseModel):
+        inner: Inner = Field(default_factory=Inner)
+
+    with use_fragment_cache(FragmentCache()) as cache:
+        with render_budget(Budget(max_depth=1, placeholder=True)):
+            assert "RENDER BUDGET EXCEEDED" in str(gen2.generate_form(Deep, Deep()))
+        assert "RENDER BUDGET EXCEEDED" not in str(gen2.generate_form(Deep, Deep()))
+    assert cache.hits == 0
+
+
+def test_stable_key_is_the_same_in_every_process() -> None:
+    code = (
+        "from datetime import date; from formgen.fragments import stable_key, value_key; "
+        "print(stable_key(value_key([date(2024, 1, 1), 'x', frozenset({'a', 'b'})])))"
+    )
+    digests = {
+        subprocess.run(
+            [sys.executable, "-c", code],
+            env={**os.environ, "PYTHONHASHSEED": seed},
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+        for seed in ("1", "2")
+    }
+    assert digests == {stable_key(value_key([date(2024, 1, 1), "x", frozenset({"a", "b"})]))}
+
+
+@pytest.fixture
+def sqlite_path(tmp_path: Path) -> Path:
+    return tmp_path / "fragments.db"
+
+
+def test_sqlite_cache_is_shared(sqlite_path: Path) -> None:
+    SqliteFragmentCache(sqlite_path).put(("k", 1), "<p>x</p>")
+    cache = SqliteFragmentCache(sqlite_path)
+    assert cache.get(("k", 1)) == "<p>x</p>"
+    assert cache.get(("k", 2)) is None
+    assert cache.stats()["entries"] == 1
+
+
+def test_sqlite_eviction(sqlite_path: Path) -> None:
+    cache = SqliteFragmentCache(sqlite_path, max_bytes=10)
+    cache.put("a", "aaaa")
+    cache.put("b", "bbbb")
+    cache.put("c", "cccc")
+    assert cache.get("a") is None
+    assert cache.get("c") == "cccc"
+    assert cache.stats()["bytes"] <= 10
+
+
+def test_sqlite_cached_forms_match_uncached(sqlite_path: Path, wide: Wide) -> None:
+    reference = str(gen2.generate_form(Wide, wide))
+    with use_fragment_cache(SqliteFragmentCache(sqlite_path)):
+        assert str(gen2.generate_form(Wide, wide)) == reference
+    # another worker, with the same file
+    with use_fragment_cache(SqliteFragmentCache(sqlite_path)) as cache:
+        assert str(gen2.generate_form(Wide, wide)) == reference
+    assert cache.hits > 0
+
+
+@pytest.mark.parametrize(
+    ("accept_encoding", "encoding"),
+    [
+        ("", "identity"),
+        ("gzip", "gzip"),
+        ("gzip;q=0.5, deflate", "gzip"),
+        ("gzip;q=0", "identity"),
+        ("gzip;q=nonsense", "identity"),
+        ("deflate, *;q=0.1", ENCODINGS[0]),
+        ("GZIP", "gzip"),
+    ],
+)
+def test_choose_encoding(accept_encoding: str, encoding: str) -> None:
+    assert choose_encoding(accept_encoding) == encoding
+
+
+def test_render_encoded() -> None:
+    cache = FragmentCache()
+    body, encoding = cache.render_encoded("page", lambda: "<p>x</p>", accept_encoding="gzip")
+    assert encoding == "gzip"
+    assert gzip.decompress(body) == b"<p>x</p>"
+    # every encoding is stored with the first render
+    assert cache.render_encoded("page", lambda: "", accept_encoding="") == (b"<p>x</p>", "identity")
+    assert cache.get_encoded("page", "gzip") == (body, "gzip")
+    assert cache.get_encoded("other", "gzip") is None
+
+
+def test_sqlite_render_encoded(sqlite_path: Path) -> None:
+    body, encoding = SqliteFragmentCache(sqlite_path).render_encoded("page", lambda: "<p>x</p>", accept_encoding="gzip")
+    assert SqliteFragmentCache(sqlite_path).get_encoded("page", "gzip, br;q=0") == (body, encoding)
+
+
+def test_render_keeps_both_serializations_in_one_entry() -> None:
+    cache = FragmentCache()
+    built = []
+
+    def build() -> Tag:
+        built.append(1)
+        return gen2.generate_form(Inner, Inner())
+
+    first = cache.render("k", build)
+    second = cache.render("k", build)
+    assert len(built) == 1
+    assert isinstance(second, Fragment)
+    assert str(second) == str(first)
+    assert second.render(compact=True) == first.render(compact=True) != str(first)
+    assert cache.stats() | {"bytes": 0} == {"hits": 1, "misses": 1, "evictions": 0, "entries": 1, "bytes": 0}
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_cached_forms_match_uncached_in_both_modes(wide: Wide, compact: bool) -> None:
+    reference = gen2.generate_form(Wide, wide).render(compact)
+    with use_fragment_cache(FragmentCache()):
+        # the first render stores what the second one serializes the other way
+        assert gen2.generate_form(Wide, wide).render(not compact) == gen2.generate_form(Wide, wide).render(not compact)
+        assert gen2.generate_form(Wide, wide).render(compact) == reference
+
+
+def test_sqlite_migrates_old_files(sqlite_path: Path) -> None:
+    with sqlite3.connect(sqlite_path) as connection:
+        connection.execute("CREATE TABLE fragments (key TEXT PRIMARY KEY, html TEXT, size INTEGER, used REAL)")
+    cache = SqliteFragmentCache(sqlite_path)
+    cache.put("k", "<p>x</p>", encodings={"gzip": b"z"}, compact_html="<p>x</p>")
+    assert cache.get("k") == "<p>x</p>"
+    assert cache.get_encoded("k", "gzip") == (b"z", "gzip")
+
+
+def test_sqlite_drops_older_markup(sqlite_path: Path) -> None:
+    SqliteFragmentCache(sqlite_path).put("k", "<p>old</p>")
+    with sqlite3.connect(sqlite_path) as connection:
+        connection.execute(f"PRAGMA user_version = {MARKUP_VERSION - 1}")
+    assert SqliteFragmentCache(sqlite_path).get("k") is None
+    # the file is on the current version now, its new entries are kept
+    SqliteFragmentCache(sqlite_path).put("k", "<p>new</p>")
+    assert SqliteFragmentCache(sqlite_path).get("k") == "<p>new</p>"
@@ -0,0 +1,126 @@
+import copy
+
+import pytest
+from models import Outer
+
+from formgen import gen1
+from formgen.budget import Budget, render_budget
+from formgen.gen1.schema import Model
+from formgen.tags import DummyTag, HTMLTag, Tag, Tags
+
+SCHEMA = Outer.model_json_schema()
+
+
+def titled(title: str) -> dict:
+    return copy.deepcopy(SCHEMA) | {"title": title}
+
+
+def test_equal_documents_share_a_parse() -> None:
+    assert gen1.parse_schema(copy.deepcopy(SCHEMA)) is gen1.parse_schema(copy.deepcopy(SCHEMA))
+    assert gen1.parse_schema(titled("a")) is not gen1.parse_schema(titled("b"))
+
+
+def test_lazy_and_eager_parses_are_kept_apart() -> None:
+    assert gen1.parse_schema(copy.deepcopy(SCHEMA), lazy=True) is not gen1.parse_schema(copy.deepcopy(SCHEMA))
+
+
+def test_least_recently_used_parse_is_evicted(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(gen1, "SCHEMA_CACHE_SIZE", 2)
+    first, second = gen1.parse_schema(titled("a")), gen1.parse_schema(titled("b"))
+    assert gen1.parse_schema(titled("a")) is first  # "b" is the least recently used now
+    gen1.parse_schema(titled("c"))
+    assert gen1.parse_schema(titled("a")) is first
+    assert gen1.parse_schema(titled("b")) is not second
+
+
+def test_clear_schema_cache() -> None:
+    parsed = gen1.parse_schema(copy.deepcopy(SCHEMA))
+    gen1.clear_schema_cache()
+    assert gen1.parse_schema(copy.deepcopy(SCHEMA)) is not parsed
+
+
+def test_parsed_model_renders_like_the_document() -> None:
+    parsed = gen1.parse_schema(SCHEMA)
+    assert isinstance(parsed, Model)
+    assert str(gen1.generate_form(parsed, values={"name": "x"})) == str(
+        gen1.generate_form(SCHEMA, values={"name": "x"})
+    )
+
+
+def walk_html(tag: Tag) -> list[HTMLTag]:
+    found = [tag] if isinstance(tag, HTMLTag) else []
+    for inner in tag.tags if isinstance(tag, Tags) else []:
+        found += walk_html(inner)
+    return found
+
+
+def test_edited_forms_dont_leak_into_later_renders() -> None:
+    parsed = gen1.parse_schema(SCHEMA)
+    reference = str(gen1.generate_form(parsed))
+    for tag in walk_html(gen1.generate_form(parsed)):
+        tag.extra_attrs["data-edited"] = "1"
+        if isinstance(tag, Tags):
+            tag.tags.append(DummyTag("edited"))
+    assert str(gen1.generate_form(parsed)) == reference
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_memoized_subforms_render_like_fresh_ones(compact: bool) -> None:
+    parsed = gen1.parse_schema(SCHEMA)
+    gen1.generate_form(parsed)
+    warm = gen1.generate_form(parsed).render(compact)
+    # placeholder budgets bypass the memo
+    with render_budget(Budget(max_depth=None, placeholder=True)):
+        fresh = gen1.generate_form(parsed).render(compact)
+    assert warm == fresh
+    assert 'name="inner.count"' in warm or "name=inner.count" in warm
+
+
+LAYERED = {
+    "title": "Layered",
+    "type": "object",
+    "properties": {
+        "old": {"title": "Old", "allOf": [{"$ref": "#/definitions/Old"}]},
+        "new": {"$ref": "#/$defs/New"},
+        "choice": {"title": "Choice", "default": "b", "allOf": [{"$ref": "#/$defs/Choice"}]},
+        "choices": {"title": "Choices", "type": "array", "default": ["a"], "items": {"$ref": "#/$defs/Choice"}},
+    },
+    "definitions": {
+        "Old": {"title": "Old", "type": "object", "properties": {"a": {"title": "A", "type": "string"}}},
+    },
+    "$defs": {
+        "New": {"title": "New", "type": "object", "properties": {"b": {"title": "B", "type": "integer"}}},
+        "Choice": {"title": "Choice", "type": "string", "enum": ["a", "b", "<c>"]},
+    }
+    | {f"Unused{i}": {"title": f"Unused{i}", "type": "object", "properties": {}} for i in range(50)},
+}
+
+
+def test_lazy_parse_resolves_both_definition_layouts() -> None:
+    eager = str(gen1.generate_form(LAYERED))
+    lazy_schema = gen1.parse_schema(LAYERED, lazy=True)
+    assert str(gen1.generate_form(lazy_schema)) == eager
+    for name in ('name="old.a"', 'name="new.b"', '<option value="b" selected>', "&lt;c&gt;"):
+        assert name in eager
+    # only what the form references is parsed
+    assert set(lazy_schema._index.definitions.parsed) == {"Old", "New", "Choice"}
+
+
+def test_missing_definitions_are_reported() -> None:
+    broken = copy.deepcopy(LAYERED)
+    del broken["$defs"]["New"]
+    for lazy in (False, True):
+        assert "_NO_REF_IN_DEF_New_" in str(gen1.generate_form(broken, lazy=lazy))
+
+
+def test_known_documents_are_not_fingerprinted_again(monkeypatch: pytest.MonkeyPatch) -> None:
+    document = copy.deepcopy(LAYERED)
+    parsed = gen1.parse_schema(document, lazy=True)
+    calls = []
+    fingerprint = gen1.schema_fingerprint
+    monkeypatch.setattr(gen1, "schema_fingerprint", lambda raw: calls.append(1) or fingerprint(raw))
+    assert gen1.parse_schema(document, lazy=True) is parsed
+    assert calls == []
+    # an equal document in another object is still matched, by fingerprint
+    assert gen1.parse_schema(copy.deepcopy(LAYERED), lazy=True) is parsed
+    assert calls == [1]
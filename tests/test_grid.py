@@ -0,0 +1,53 @@
+import pytest
+from models import Inner
+from pydantic import BaseModel, Field
+
+from formgen.gen2 import bind_input, compile_model_plan
+from formgen.gen2.grid import iter_render_table, render_table
+from formgen.tags import DummyTag, TableTag, TdTag, ThTag, TrTag
+
+
+class Row(BaseModel):
+    label: str = "x"
+    count: int = 1
+    inner: Inner = Field(default_factory=Inner)
+
+
+ROWS = [Row(label=f"<{i}>", count=i) for i in range(3)]
+
+
+def expected_table(rows: list[Row], compact: bool, disabled_fields: list[str] | None = None) -> str:
+    header = TrTag(tags=[ThTag(tags=[DummyTag(label)]) for label in ("Label", "Count", "Inner")])
+    body = []
+    for i, row in enumerate(rows):
+        plan = compile_model_plan(
+            model_type=Row,
+            field_name_root=f"rows.{i}",
+            disabled_fields=[f"rows.{i}.{name}" for name in disabled_fields or []],
+        )
+        body.append(TrTag(tags=[TdTag(tags=[bind_input(field_plan, row)]) for field_plan in plan.fields]))
+    return TableTag(class_="table", tags=[header, *body]).render(compact)
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_table_matches_tree_rows(compact: bool) -> None:
+    assert render_table(Row, ROWS, compact=compact) == expected_table(ROWS, compact)
+
+
+def test_disabled_columns() -> None:
+    table = render_table(Row, ROWS, disabled_fields=["count"])
+    assert table == expected_table(ROWS, False, disabled_fields=["count"])
+    assert table.count("disabled") == len(ROWS)
+
+
+def test_row_names_and_ids() -> None:
+    table = render_table(Row, ROWS, name_root="items", table_id="t")
+    assert 'id="t"' in table
+    for i in range(len(ROWS)):
+        assert f'name="items.{i}.count"' in table
+        assert f'name="items.{i}.inner.count"' in table
+
+
+def test_streamed_and_empty_tables() -> None:
+    assert "".join(iter_render_table(Row, ROWS)) == render_table(Row, ROWS)
+    assert render_table(Row, []) == expected_table([], False)
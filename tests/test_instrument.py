@@ -0,0 +1,99 @@
+import pytest
+from models import Outer, Wide
+
+from formgen import gen1, gen2
+from formgen.instrument import BUCKETS_NS, Profiler, count_nodes, current_profiler, escape_label, profiling
+from formgen.tags import OptionList, OptionTag, SelectedOptions, SelectTag
+
+PATHS = ["name", "color", "colors", "inner.count", "inner.note", "inner", "flag"]
+
+
+def test_profiling_is_scoped() -> None:
+    assert current_profiler() is None
+    profiler = Profiler()
+    with profiling(profiler) as active:
+        assert active is profiler
+        assert current_profiler() is profiler
+    assert current_profiler() is None
+
+
+def test_gen2_fields(wide: Wide, outer: Outer) -> None:
+    with profiling() as profiler:
+        form = gen2.generate_form(Outer, outer)
+    assert str(form) == str(gen2.generate_form(Outer, outer))
+
+    assert list(profiler.by_path) == PATHS
+    assert sum(stats.calls for stats in profiler.by_type.values()) == len(PATHS)
+    # a nested model counts the nodes of its fields, plus its own
+    inner = profiler.by_path["inner"].nodes
+    assert inner > profiler.by_path["inner.count"].nodes + profiler.by_path["inner.note"].nodes
+    assert profiler.by_type["NESTED_MODEL"].nodes == inner
+
+    with profiling() as profiler:
+        gen2.generate_form(Wide, wide)
+    assert {"STRING", "NESTED_MODEL", "ENUM"} <= profiler.by_type.keys()
+
+
+def test_gen1_fields(outer: Outer) -> None:
+    schema = Outer.model_json_schema()
+    values = outer.model_dump(mode="json")
+    with profiling() as profiler:
+        form = gen1.generate_form(schema, values=values)
+    assert str(form) == str(gen1.generate_form(schema, values=values))
+    assert list(profiler.by_path) == PATHS
+    assert profiler.by_type["string"].calls == 2
+
+
+def test_serialize_counts_bytes(outer: Outer) -> None:
+    form = gen2.generate_form(Outer, outer)
+    profiler = Profiler()
+    assert profiler.serialize(form) == str(form)
+    assert profiler.serialize(form, compact=True) == form.render(compact=True)
+    assert profiler.serialization.calls == 2
+    assert profiler.serialization.nodes == 2 * count_nodes(form)
+    assert profiler.output_bytes == len(str(form).encode()) + len(form.render(compact=True).encode())
+
+
+def test_histograms_match_counters(outer: Outer) -> None:
+    with profiling() as profiler:
+        for _ in range(3):
+            gen2.generate_form(Outer, outer)
+
+    counters = profiler.counters()
+    calls = {
+        labels["type"]: value
+        for name, labels, value in counters
+        if "type" in labels and name == "formgen_field_calls_total"
+    }
+    for name, labels, histogram in profiler.histograms():
+        assert len(histogram.counts) == len(BUCKETS_NS) + 1
+        if name == "formgen_field_ns":
+            assert sum(histogram.counts) == calls[labels["type"]]
+            assert histogram.sum == profiler.by_type[labels["type"]].elapsed_ns
+
+
+def test_prometheus_text(outer: Outer) -> None:
+    with profiling() as profiler:
+        profiler.serialize(gen2.generate_form(Outer, outer))
+    text = profiler.to_prometheus()
+    assert text.endswith("\n")
+    assert 'formgen_field_calls_total{type="STRING"} 2\n' in text
+    assert 'formgen_field_calls_total{path="inner.note"} 1\n' in text
+    assert 'formgen_serialize_ns_bucket{le="+Inf"} 1\n' in text
+    assert "formgen_serialize_ns_count 1\n" in text
+    assert f"formgen_output_bytes_total {profiler.output_bytes}\n" in text
+
+
+@pytest.mark.parametrize(
+    ("value", "escaped"),
+    [("plain", "plain"), ('a"b', 'a\\"b'), ("a\\b", "a\\\\b"), ("a\nb", "a\\nb")],
+)
+def test_escape_label(value: str, escaped: str) -> None:
+    assert escape_label(value) == escaped
+
+
+def test_count_nodes_counts_shared_options_without_building_them() -> None:
+    options = OptionList.build(["a", "b", "c"])
+    shared = SelectTag(options=SelectedOptions(options, (1,)))
+    plain = SelectTag(options=[OptionTag(value=value) for value in "abc"])
+    assert count_nodes(shared) == count_nodes(plain) == 4
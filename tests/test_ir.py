@@ -0,0 +1,69 @@
+import pickle
+
+import pytest
+from models import Outer, Wide
+
+from formgen import gen2
+from formgen.fragments import FragmentCache, use_fragment_cache
+from formgen.ir import FormIR, Op, from_ir, to_ir
+from formgen.tags import DivTag, DummyTag, Tags
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_round_trip_renders_the_same(outer: Outer, hostile: Outer, wide: Wide, compact: bool) -> None:
+    for model_type, model in ((Outer, outer), (Outer, hostile), (Wide, wide), (Wide, None)):
+        tag = gen2.generate_form(model_type, model)
+        ir = to_ir(tag)
+        assert ir.render(compact) == tag.render(compact)
+        assert from_ir(ir).render(compact) == tag.render(compact)
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_round_trip_of_cached_fragments(wide: Wide, compact: bool) -> None:
+    with use_fragment_cache(FragmentCache()):
+        gen2.generate_form(Wide, wide)
+        # made of cached fragments, which keep both serializations
+        tag = gen2.generate_form(Wide, wide)
+    ir = to_ir(tag)
+    assert ir.render(compact) == tag.render(compact) == gen2.generate_form(Wide, wide).render(compact)
+    assert from_ir(ir).render(compact) == tag.render(compact)
+    assert to_ir(from_ir(ir)) == ir
+
+
+def test_round_trip_is_stable(wide: Wide) -> None:
+    ir = to_ir(gen2.generate_form(Wide, wide))
+    assert to_ir(from_ir(ir)) == ir
+
+
+def test_pickled_ir_renders_the_same(outer: Outer) -> None:
+    ir = to_ir(gen2.generate_form(Outer, outer))
+    restored = pickle.loads(pickle.dumps(ir))
+    assert restored == ir
+    assert restored.render() == ir.render()
+    # the string index is rebuilt, known strings are not added again
+    assert restored.string(ir.strings[-1]) == len(ir.strings) - 1
+    assert len(restored.strings) == len(ir.strings)
+
+
+def test_slice_renders_a_part() -> None:
+    ir = to_ir(Tags([DummyTag("a"), DummyTag("b")]))
+    assert ir.slice(0, 1).render() == "a"
+    assert ir.slice(1, len(ir)).render() == "\nb"
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_wide_string_table(compact: bool) -> None:
+    # more than 0xFFFF distinct strings, the instruction array is widened halfway through
+    tag = Tags([DivTag(id=f"d{i}", tags=[DummyTag(f"t{i}")]) for i in range(40000)])
+    ir = to_ir(tag)
+    assert ir.code.typecode == "I"
+    assert ir.render(compact) == tag.render(compact)
+
+
+def test_widening_keeps_the_current_instruction() -> None:
+    ir = FormIR()
+    for i in range(0xFFFF):
+        ir.string(str(i))
+    ir.emit(Op.TEXT, "new")  # the 0xFFFF-th string
+    assert ir.code.typecode == "I"
+    assert ir.render() == "new"
@@ -0,0 +1,59 @@
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+import pytest
+from models import Outer, Wide
+from pydantic import BaseModel, create_model
+
+from formgen.gen2 import generate_form
+from formgen.gen2.parallel import PARALLEL_MIN_FIELDS, generate_form_parallel
+
+# wide enough to go through the pool with the default threshold
+Many: type[BaseModel] = create_model(  # type: ignore[call-overload]
+    "Many",
+    **{f"field_{i}": (int, i) for i in range(PARALLEL_MIN_FIELDS)},
+    **{f"inner_{i}": (Outer, Outer(name=f"<{i}>")) for i in range(8)},
+)
+
+
+class CountingExecutor(ThreadPoolExecutor):
+    def __init__(self) -> None:
+        super().__init__(max_workers=4)
+        self.chunks = 0
+
+    def map(self, fn: Callable, *iterables: Iterable, **kwargs: Any) -> Iterator:  # type: ignore[override]
+        chunks = list(iterables[0])
+        self.chunks += len(chunks)
+        return super().map(fn, chunks, **kwargs)
+
+
+@pytest.mark.parametrize("chunk_size", [None, 1, 7, 1000])
+def test_chunks_are_joined_in_field_order(chunk_size: int | None) -> None:
+    model = Many()
+    with CountingExecutor() as executor:
+        form = generate_form_parallel(Many, model, form_id="f", executor=executor, workers=4, chunk_size=chunk_size)
+    assert str(form) == str(generate_form(Many, model, form_id="f"))
+    assert executor.chunks == (-(-len(Many.model_fields) // chunk_size) if chunk_size else 8)
+
+
+def test_compact_and_options() -> None:
+    options = {"readonly": True, "disabled_fields": ["field_3", "inner_1.name"], "form_class": "c"}
+    with CountingExecutor() as executor:
+        form = generate_form_parallel(Many, Many(), executor=executor, workers=2, compact=True, **options)
+    assert form.render(compact=True) == generate_form(Many, Many(), **options).render(compact=True)
+
+
+def test_narrow_models_stay_in_the_calling_thread(wide: Wide) -> None:
+    with CountingExecutor() as executor:
+        form = generate_form_parallel(Wide, wide, executor=executor)
+        assert str(form) == str(generate_form(Wide, wide))
+        assert executor.chunks == 0
+
+        generate_form_parallel(Wide, wide, executor=executor, min_fields=len(Wide.model_fields))
+        assert executor.chunks > 0
+
+
+def test_default_process_pool(wide: Wide) -> None:
+    form = generate_form_parallel(Wide, wide, workers=2, min_fields=0)
+    assert str(form) == str(generate_form(Wide, wide))
@@ -0,0 +1,148 @@
+import pickle
+from enum import Enum, IntEnum
+
+import pytest
+
+from formgen.tags import (
+    DivTag,
+    DummyTag,
+    FormTag,
+    HTMLTag,
+    InputTag,
+    LabelTag,
+    OptionList,
+    OptionTag,
+    PTag,
+    SelectedOptions,
+    SelectTag,
+    Tags,
+    TdTag,
+)
+
+
+def test_default_style_and_attrs_are_mutable() -> None:
+    tag = InputTag(name="a")
+    tag.style.append("color: red")
+    tag.extra_attrs["data-x"] = "1"
+    assert str(tag) == '<input style="color: red" name="a" data-x="1">'
+
+
+def test_defaults_are_not_shared() -> None:
+    first, second = DivTag(), DivTag()
+    first.style.append("x")
+    first.extra_attrs["a"] = "b"
+    assert second.style == []
+    assert second.extra_attrs == {}
+    assert str(second) == str(DivTag())
+
+
+def test_rendering_leaves_defaults_unallocated() -> None:
+    tag = PTag(tags=[InputTag(name="a")])
+    tag.render()
+    tag.render(compact=True)
+    for inner in (tag, tag.tags[0]):
+        assert type(inner).style.slot.__get__(inner) is None
+        assert type(inner).extra_attrs.slot.__get__(inner) is None
+
+
+def test_passed_containers_are_kept() -> None:
+    style = ["a"]
+    tag = DivTag(style=style)
+    tag.style.append("b")
+    assert style == ["a", "b"]
+    assert 'style="a b"' in str(tag)
+
+
+@pytest.mark.parametrize("cls", [InputTag, OptionTag, DummyTag, SelectTag])
+def test_leaves_have_no_tags_slot(cls: type) -> None:
+    tag = cls("x") if cls is DummyTag else cls()
+    assert not hasattr(tag, "__dict__")
+    assert "tags" not in {slot for klass in cls.__mro__ for slot in getattr(klass, "__slots__", ())}
+
+
+@pytest.mark.parametrize("cls", [DivTag, PTag, TdTag, FormTag])
+def test_containers_are_slotted_tags(cls: type) -> None:
+    tag = cls(tags=[DummyTag("x")])
+    assert isinstance(tag, Tags)
+    assert isinstance(tag, HTMLTag)
+    assert not hasattr(tag, "__dict__")
+
+
+def test_tags_pickle() -> None:
+    tag = DivTag(class_="a", tags=[InputTag(name="b", extra_attrs={"c": "d"})])
+    tag.style.append("x")
+    restored = pickle.loads(pickle.dumps(tag))
+    assert restored == tag
+    assert str(restored) == str(tag)
+
+
+def test_compact_render_drops_whitespace_between_tags() -> None:
+    tag = Tags([DivTag(class_="a b", tags=[LabelTag(label="x")]), InputTag(name="n", value="")])
+    assert str(tag) == '<div class="a b">\n<label >x</label>\n</div>\n<input name="n">'
+    assert tag.render(compact=True) == '<div class="a b"><label>x</label></div><input name=n>'
+    assert "".join(tag.iter_render(compact=True)) == tag.render(compact=True)
+
+
+class Aliased(Enum):
+    a = 1
+    b = 2
+    also_a = 1  # noqa: PIE796 # an alias of `a`
+
+
+class Mixed(str, Enum):
+    x = "x"
+    y = "y"
+
+
+class Number(IntEnum):
+    one = 1
+    two = 2
+
+
+def plain_options(values: list, selected: object) -> list[OptionTag]:
+    return [OptionTag(value=str(value), selected=value == selected) for value in values]
+
+
+@pytest.mark.parametrize(
+    ("values", "selected"),
+    [
+        (list(Aliased._member_map_.values()), Aliased.a),
+        (list(Mixed), "y"),
+        (list(Mixed), Mixed.x),
+        (list(Number), 2),
+        (["<a>", "b & c"], "<a>"),
+        (["a", "b"], "missing"),
+    ],
+)
+@pytest.mark.parametrize("compact", [False, True])
+def test_option_list_renders_like_option_tags(values: list, selected: object, compact: bool) -> None:
+    options = OptionList.build(values)
+    tag = SelectTag(name="s", options=SelectedOptions(options, options.select(selected)))
+    assert tag.render(compact) == SelectTag(name="s", options=plain_options(values, selected)).render(compact)
+
+
+def test_option_list_aliases_and_mixins() -> None:
+    aliased = OptionList.build(list(Aliased._member_map_.values()))
+    assert aliased.select(Aliased.a) == aliased.select(Aliased.also_a) == (0, 2)
+    assert aliased.select(1) == ()
+
+    mixed = OptionList.build(list(Mixed))
+    assert mixed.select("y") == mixed.select(Mixed.y) == (1,)
+    assert OptionList.build(list(Number)).select(2) == (1,)
+    assert mixed.select_any(["y", Mixed.x, "y"]) == (0, 1)
+
+
+def test_option_list_unhashable_values() -> None:
+    with pytest.raises(TypeError):
+        OptionList.build([[1], [2]])
+    options = OptionList.build(list(Mixed))
+    # compared one by one instead of looked up
+    assert options.select(["x"]) == ()
+    assert options.select_any([["x"], "x"]) == (0,)
+
+
+def test_selected_options_iterate_as_tags() -> None:
+    options = OptionList.build(list(Mixed))
+    selected = SelectedOptions(options, options.select("y"))
+    assert len(selected) == 2
+    assert [str(tag) for tag in selected] == [str(tag) for tag in plain_options(list(Mixed), Mixed.y)]
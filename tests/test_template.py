@@ -0,0 +1,50 @@
+import pytest
+from models import Cat, Inner, Outer, Wide
+
+from formgen import gen2
+from formgen.gen2 import Context, Contexts, FieldType
+from formgen.gen2.template import get_template, iter_render_form, render_form
+
+CONTEXTS = Contexts(
+    {
+        "description": Context(override=FieldType.TEXTAREA, attributes={"rows": "3"}),
+        "inner": Contexts({"count": Context(attributes={"min": "0"})}),
+        "title": Context(attributes={"required": None, "data-x": "1"}),
+    },
+)
+
+OPTIONS = [
+    {},
+    {"readonly": True},
+    {"disabled_fields": ["title", "inner.count"]},
+    {"contexts": CONTEXTS},
+    {"form_id": "f", "form_class": "a b"},
+]
+
+
+@pytest.mark.parametrize("options", OPTIONS)
+@pytest.mark.parametrize("compact", [False, True])
+def test_template_matches_tree(wide: Wide, options: dict, compact: bool) -> None:
+    for model in (wide, Wide(pet=Cat(lives=3)), None):
+        tree = gen2.generate_form(Wide, model, **options).render(compact)
+        assert render_form(Wide, model, compact=compact, **options) == tree
+
+
+def test_template_matches_tree_for_enums(outer: Outer) -> None:
+    for model in (outer, Outer(colors=[]), None):
+        assert render_form(Outer, model) == str(gen2.generate_form(Outer, model))
+
+
+def test_template_is_compiled_once(outer: Outer) -> None:
+    plan = gen2.compile_model_plan(model_type=Outer)
+    template = get_template(plan)
+    render_form(Outer, outer)
+    render_form(Outer, Outer(inner=Inner(count=5)))
+    assert get_template(gen2.compile_model_plan(model_type=Outer)) is template
+    assert get_template(plan, compact=True) is not template
+
+
+def test_streamed_chunks_join_to_the_form(outer: Outer) -> None:
+    chunks = list(iter_render_form(Outer, outer, form_id="f"))
+    assert len(chunks) > 2
+    assert "".join(chunks) == render_form(Outer, outer, form_id="f")
@@ -0,0 +1,53 @@
+import threading
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from models import Inner, Outer
+
+from formgen import gen1, gen2
+from formgen.gen2.template import render_form
+
+THREADS = 8
+ROUNDS = 50
+
+SCHEMA = Outer.model_json_schema()
+
+
+def render_concurrently(render: Callable[[], str]) -> set[str]:
+    barrier = threading.Barrier(THREADS)
+
+    def worker() -> set[str]:
+        barrier.wait()
+        return {render() for _ in range(ROUNDS)}
+
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        return set().union(*executor.map(lambda _: worker(), range(THREADS)))
+
+
+@pytest.mark.parametrize(
+    ("render", "clear"),
+    [
+        (lambda model: str(gen2.generate_form(Outer, model)), gen2.clear_plan_cache),
+        (lambda model: render_form(Outer, model), gen2.clear_plan_cache),
+        (lambda model: str(gen1.generate_form(SCHEMA, values=model.model_dump(mode="json"))), gen1.clear_schema_cache),
+    ],
+    ids=["gen2 tree", "gen2 template", "gen1"],
+)
+def test_threaded_matches_single_threaded(render: Callable, clear: Callable, outer: Outer) -> None:
+    reference = render(outer)
+    # every thread starts on cold caches, so racing compiles have to converge on the same output
+    clear()
+    assert render_concurrently(lambda: render(outer)) == {reference}
+
+
+def test_threaded_distinct_models() -> None:
+    models = [Outer(name=str(i), inner=Inner(count=i)) for i in range(THREADS)]
+    references = [str(gen2.generate_form(Outer, model)) for model in models]
+    gen2.clear_plan_cache()
+
+    def render(i: int) -> list[bool]:
+        return [str(gen2.generate_form(Outer, models[i])) == references[i] for _ in range(ROUNDS)]
+
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        assert all(all(results) for results in executor.map(render, range(THREADS)))